@@ -0,0 +1,475 @@
+"""Benchmark the logger file pipelines on deterministic synthetic files.
+
+Generates BAM (headerless, hourly), met (TOA5, 15-minute) and station
+(CSV, 5-minute) files of any size from a fixed seed, so every run measures
+the same bytes. Each file is cached in the data directory and reused.
+
+Every case runs in a fresh process and times the stages of the tools that
+read that kind of file:
+
+    dat.parse / dat.datetime / dat.cast / dat.write    dat_formatter
+    time.parse / time.resample / time.write            timechange
+    plot.render                                        render (plot.py charts)
+
+Wall time, peak RSS and rows/s per stage are appended to a JSON history.
+A stage slower (or bigger) than the median of its last runs on this host by
+more than --threshold is a regression and the exit status is 1.
+
+    python bench.py                              # default matrix
+    python bench.py -k met -r 1M 10M -c 200      # one kind, bigger files
+    python bench.py --threshold 0.1 --repeat 5
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+from multiprocessing import get_context
+
+# Measure the CSV parse itself, not a hit in the shared logger cache
+os.environ.setdefault("LOGGER_CACHE", "0")
+
+import numpy as np  # noqa: E402
+import polars as pl  # noqa: E402
+
+from profiling import peak_rss_mb, reset_peak_rss  # noqa: E402
+
+HOME = os.getenv("HOME")
+
+DATA_DIR = os.getenv("BENCH_DATA_DIR", f"{HOME}/.cache/pyscripts/bench")
+HISTORY_PATH = os.getenv("BENCH_HISTORY", f"{DATA_DIR}/history.json")
+
+SEED = 20240101
+# Bump when the generated files change, so cached ones are not reused
+GENERATOR_VERSION = 1
+
+KINDS = ("bam", "met", "station")
+ROWS = ("1k", "100k", "1M")
+COLUMNS = (20, 200)
+# Tools run on each kind of file
+PIPELINES = {"bam": ("dat",), "met": ("dat", "time", "plot"), "station": ("time", "plot")}
+
+# Regression check: compare against the median of this many earlier runs, and
+# ignore differences below the noise floor of small cases
+BASELINE_RUNS = 5
+THRESHOLD = 0.2
+MIN_SECONDS = 0.05
+MIN_RSS_MB = 16
+
+# ---------- Generator ----------
+
+START = np.datetime64("2024-01-01T00:00", "ms")
+INTERVAL_MINUTES = {"bam": 60, "met": 15, "station": 5}
+# Rows generated and written at a time, scaled down for wide files
+BLOCK_VALUES = 2_000_000
+
+# Met and station columns as (stem, suffix); repeated with a number on the
+# stem for wide files, so the name rules in timechange still apply
+MET_COLUMNS = [
+    ("AirTC", "_Avg"),
+    ("RH", ""),
+    ("WS_ms", "_Avg"),
+    ("WindDir", ""),
+    ("WS_ms", "_Max"),
+    ("Rain_mm", "_Tot"),
+    ("BP_mbar", "_Avg"),
+    ("SlrW", "_Avg"),
+    ("AirTC", "_Max"),
+    ("AirTC", "_Min"),
+]
+MET_UNITS = {"AirTC": "Deg C", "RH": "%", "WS_ms": "meters/second", "WindDir": "degrees",
+             "Rain_mm": "mm", "BP_mbar": "mbar", "SlrW": "W/m^2"}
+# (low, high) of the generated values per stem
+MET_RANGES = {"AirTC": (-20, 45), "RH": (5, 100), "WS_ms": (0, 25), "WindDir": (0, 360),
+              "Rain_mm": (0, 2), "BP_mbar": (850, 1050), "SlrW": (0, 1200)}
+# Share of values written as missing
+MISSING = 0.001
+
+BAM_FLOAT_COLUMNS = 8
+BAM_FLAG_COLUMNS = 12
+
+
+def parse_count(text):
+    """'1k' -> 1000, '50M' -> 50000000."""
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1].lower())
+    return int(float(text[:-1]) * scale) if scale else int(text)
+
+
+def value_columns(cols):
+    """Names of the `cols` value columns of a met or station file."""
+    names = []
+    for i in range(cols):
+        stem, suffix = MET_COLUMNS[i % len(MET_COLUMNS)]
+        k = i // len(MET_COLUMNS)
+        names.append(f"{stem}{k + 1 if k else ''}{suffix}")
+    return names
+
+
+def stem_of(name):
+    return next(stem for stem, _ in MET_COLUMNS if name.startswith(stem))
+
+
+def data_path(kind, rows, cols, seed=SEED):
+    ext = ".csv" if kind == "station" else ".dat"
+    # BAM files keep "bam" in the name: dat_formatter casts only those
+    name = f"bench-{kind}_{rows}x{cols}_s{seed}_v{GENERATOR_VERSION}{ext}"
+    return os.path.join(DATA_DIR, name)
+
+
+def toa5_header(columns):
+    names = ["TIMESTAMP", "RECORD", *columns]
+    units = ["TS", "RN", *(MET_UNITS[stem_of(c)] for c in columns)]
+    process = ["", "", *("Smp" if not c.endswith(("_Avg", "_Max", "_Min", "_Tot"))
+                         else c.rsplit("_", 1)[1] for c in columns)]
+    env = ["TOA5", "BenchMet", "CR1000X", "1234", "CR1000X.Std.05.00", "CPU:bench.CR1X",
+           "12345", "Min15"]
+    return "".join(",".join(f'"{v}"' for v in line) + "\n" for line in (env, names, units, process))
+
+
+def block_frame(kind, rng, first, n, cols, level):
+    """Rows first..first+n of one file as a frame ready to write.
+
+    `level` carries the random walk of the value columns across blocks.
+    """
+    step = np.timedelta64(INTERVAL_MINUTES[kind], "m")
+    stamps = START + (np.arange(first, first + n) * step)
+
+    if kind == "bam":
+        conc = rng.gamma(2.0, 0.01, (n, BAM_FLOAT_COLUMNS))
+        conc[:, 1:] = rng.normal(16.7, 0.2, (n, BAM_FLOAT_COLUMNS - 1))
+        flags = (rng.random((n, BAM_FLAG_COLUMNS)) < 0.01).astype(np.int8)
+        # BAM exports pad the values, so the string strip has real work
+        return pl.DataFrame({
+            "column_1": pl.Series(stamps).dt.strftime("%m/%d/%y %H:%M"),
+            **{f"column_{i + 2}": np.round(conc[:, i], 3) for i in range(BAM_FLOAT_COLUMNS)},
+            **{f"column_{i + 2 + BAM_FLOAT_COLUMNS}": flags[:, i] for i in range(BAM_FLAG_COLUMNS)},
+        }).select(
+            "column_1", (pl.lit(" ") + pl.exclude("column_1").cast(pl.String)).name.keep()
+        )
+
+    names = value_columns(cols)
+    lo = np.array([MET_RANGES[stem_of(c)][0] for c in names])
+    hi = np.array([MET_RANGES[stem_of(c)][1] for c in names])
+    # A slow random walk inside each range looks like logger data, not noise
+    walk = level + np.cumsum(rng.normal(0, 0.01, (n, cols)), axis=0)
+    level[:] = walk[-1]
+    values = np.round(lo + (hi - lo) * (0.5 + 0.45 * np.sin(walk)), 3)
+    values[rng.random((n, cols)) < MISSING] = np.nan
+
+    frame = {"TIMESTAMP": pl.Series(stamps).dt.strftime("%Y-%m-%d %H:%M:%S")}
+    if kind == "met":
+        frame["RECORD"] = np.arange(first, first + n)
+    else:
+        frame["STATION"] = ["BENCH"] * n
+    frame.update({c: values[:, i] for i, c in enumerate(names)})
+    return pl.DataFrame(frame).with_columns(pl.col(pl.Float64).fill_nan(None))
+
+
+def generate(kind, rows, cols, path, seed=SEED):
+    """Write one synthetic file; the same arguments always give the same bytes."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    rng = np.random.default_rng([seed, KINDS.index(kind), cols])
+    block = max(1, BLOCK_VALUES // max(cols, 1))
+    level = np.zeros(cols)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        if kind == "met":
+            f.write(toa5_header(value_columns(cols)).encode())
+        elif kind == "station":
+            f.write((",".join(["TIMESTAMP", "STATION", *value_columns(cols)]) + "\n").encode())
+        for first in range(0, rows, block):
+            df = block_frame(kind, rng, first, min(block, rows - first), cols, level)
+            if kind == "met":
+                df.write_csv(f, include_header=False, null_value="NAN", quote_style="non_numeric")
+            else:
+                df.write_csv(f, include_header=False)
+    os.replace(tmp, path)
+    return path
+
+
+def ensure_file(kind, rows, cols, seed=SEED):
+    path = data_path(kind, rows, cols, seed)
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        generate(kind, rows, cols, path, seed)
+        size = os.path.getsize(path) / 1024**2
+        print(f"ℹ️ Generated {path} ({size:,.1f} MB) in {time.perf_counter() - start:.1f}s")
+    return path
+
+
+# ---------- Measurement ----------
+
+
+@contextmanager
+def stage(results, name):
+    reset_peak_rss()
+    start = time.perf_counter()
+    yield
+    results.append((name, time.perf_counter() - start, peak_rss_mb()))
+
+
+def bench_dat(path, out_dir, results):
+    """dat_formatter.convert_file, one materialized stage at a time."""
+    import dat_formatter
+
+    with stage(results, "dat.parse"):
+        _, lf, padded, typed = dat_formatter.scan_file(path)
+        df = lf.collect()
+
+    formats = dat_formatter.detect_datetime_formats(df.lazy())
+    with stage(results, "dat.datetime"):
+        df = dat_formatter.parse_datetime(df.lazy(), formats).collect()
+
+    if dat_formatter.is_bam(path):
+        with stage(results, "dat.cast"):
+            df = dat_formatter.cast_schema(df.lazy(), padded, typed).collect()
+
+    with stage(results, "dat.write"):
+        df.write_csv(
+            os.path.join(out_dir, "dat.csv"),
+            float_scientific=False,
+            datetime_format=dat_formatter.OUTPUT_DATETIME_FORMAT,
+        )
+
+
+def bench_time(path, out_dir, results, backend):
+    import timechange
+
+    with stage(results, "time.parse"):
+        # Includes timechange's datetime parse and numeric coercion
+        df = timechange.read_frame(path, backend)
+    if df is None:
+        raise RuntimeError(f"timechange could not read {path}")
+
+    current = timechange.detect_interval_minutes(df)
+    with stage(results, "time.resample"):
+        res = timechange.resample(df, current, 60)
+
+    with stage(results, "time.write"):
+        timechange.write_frame(res, os.path.join(out_dir, "time.csv"))
+
+
+def bench_plot(path, out_dir, results):
+    import render
+
+    header = pl.read_csv(path, n_rows=0, skip_rows=1 if path.endswith(".dat") else 0)
+    ys = [c for c in header.columns if c not in ("TIMESTAMP", "RECORD", "STATION")][:3]
+    with stage(results, "plot.render"):
+        render.render_chart(
+            {"file": path, "x": "TIMESTAMP", "y": ys, "out": os.path.join(out_dir, "plot.png")}
+        )
+
+
+def run_case(kind, path, backend, out_dir):
+    """Run every pipeline for one file; [(stage, seconds, peak RSS MB)]."""
+    results = []
+    os.makedirs(out_dir, exist_ok=True)
+    # The tools report each step; keep the benchmark output readable
+    with redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for tool in PIPELINES[kind]:
+            if tool == "dat":
+                bench_dat(path, out_dir, results)
+            elif tool == "time":
+                bench_time(path, out_dir, results, backend)
+            else:
+                bench_plot(path, out_dir, results)
+    return results
+
+
+def measure(kind, path, backend, repeat):
+    """Best of `repeat` runs per stage, each run in a fresh process."""
+    runs = []
+    out_dir = os.path.join(DATA_DIR, "out")
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            runs.append(pool.submit(run_case, kind, path, backend, out_dir).result())
+    return [
+        (name, min(r[i][1] for r in runs), min(r[i][2] for r in runs))
+        for i, (name, _, _) in enumerate(runs[0])
+    ]
+
+
+# ---------- History ----------
+
+
+def load_history(path=HISTORY_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"runs": []}
+
+
+def save_history(history, path=HISTORY_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(history, f, indent=1)
+    os.replace(tmp, path)
+
+
+def git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True,
+        )
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def baseline(history, run, case, name, runs=BASELINE_RUNS):
+    """Median seconds and peak RSS of the last `runs` comparable results:
+    same host and timechange backend."""
+    past = [
+        r
+        for old in history["runs"]
+        if old["host"] == run["host"] and old.get("backend") == run["backend"]
+        for r in old["results"] if r["case"] == case and r["stage"] == name
+    ][-runs:]
+    if not past:
+        return None
+    return (
+        statistics.median(r["seconds"] for r in past),
+        statistics.median(r["peak_rss_mb"] for r in past),
+    )
+
+
+def check(result, base, threshold):
+    """Regression messages for one result against its baseline."""
+    if base is None:
+        return []
+    seconds, rss = base
+    problems = []
+    if result["seconds"] > seconds * (1 + threshold) and result["seconds"] - seconds > MIN_SECONDS:
+        problems.append(f"time {seconds:.3f}s → {result['seconds']:.3f}s")
+    if result["peak_rss_mb"] > rss * (1 + threshold) and result["peak_rss_mb"] - rss > MIN_RSS_MB:
+        problems.append(f"RSS {rss:,.0f} → {result['peak_rss_mb']:,.0f} MB")
+    return problems
+
+
+def cases(kinds, rows, cols):
+    """(kind, rows, cols) to run; BAM files always have their fixed 21 columns."""
+    seen = []
+    for kind in kinds:
+        for n in rows:
+            for c in cols:
+                case = (kind, n, 1 + BAM_FLOAT_COLUMNS + BAM_FLAG_COLUMNS if kind == "bam" else c)
+                if case not in seen:
+                    seen.append(case)
+    return seen
+
+
+def run_bench(args):
+    history = load_history(args.history)
+    run = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "host": platform.node(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "polars": pl.__version__,
+        "backend": args.backend,
+        "repeat": args.repeat,
+        "results": [],
+    }
+
+    regressions, failures = [], []
+    start = time.perf_counter()
+    for kind, rows, cols in cases(args.kind, [parse_count(r) for r in args.rows], args.cols):
+        path = ensure_file(kind, rows, cols, args.seed)
+        case = f"{kind}-{rows}x{cols}"
+        try:
+            stages = measure(kind, path, args.backend, args.repeat)
+        except Exception as e:
+            error = str(e).splitlines()[0] if str(e) else type(e).__name__
+            print(f"❌ {case}: {error}")
+            failures.append(f"{case}: {error}")
+            continue
+
+        for name, seconds, rss in stages:
+            result = {
+                "case": case,
+                "kind": kind,
+                "rows": rows,
+                "cols": cols,
+                "stage": name,
+                "seconds": round(seconds, 4),
+                "rows_per_s": round(rows / seconds) if seconds else None,
+                "peak_rss_mb": round(rss, 1),
+            }
+            run["results"].append(result)
+            base = baseline(history, run, case, name, args.baseline)
+            problems = check(result, base, args.threshold)
+            change = f" ({seconds / base[0] - 1:+.0%})" if base and base[0] else ""
+            line = (
+                f"{case:<22} {name:<14} {seconds:>9.3f}s{change:<8} "
+                f"{rows / seconds if seconds else 0:>14,.0f} rows/s {rss:>9,.0f} MB"
+            )
+            if problems:
+                regressions.append(f"{case} {name}: {', '.join(problems)}")
+                print(f"❌ {line}")
+            else:
+                print(f"✅ {line}")
+
+    if not args.no_record:
+        history["runs"].append(run)
+        save_history(history, args.history)
+        print(f"ℹ️ Recorded {len(run['results'])} results to {args.history}")
+    print(f"ℹ️ Finished in {time.perf_counter() - start:.1f}s")
+
+    if failures:
+        print(f"⚠️ {len(failures)} cases failed:")
+        for f in failures:
+            print(f"   {f}")
+    if regressions:
+        print(f"⚠️ {len(regressions)} regressions over {args.threshold:.0%}:")
+        for r in regressions:
+            print(f"   {r}")
+    if failures or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark dat_formatter, timechange and plotting on synthetic logger files."
+    )
+    parser.add_argument("-k", "--kind", nargs="+", choices=KINDS, default=list(KINDS),
+                        help="File kinds to generate and benchmark")
+    parser.add_argument("-r", "--rows", nargs="+", default=list(ROWS),
+                        help="Row counts, e.g. 1k 100k 1M 50M")
+    parser.add_argument("-c", "--cols", nargs="+", type=int, default=list(COLUMNS),
+                        help="Value columns of met and station files")
+    parser.add_argument("-b", "--backend", choices=["pandas", "polars"], default="pandas",
+                        help="timechange backend")
+    parser.add_argument("-n", "--repeat", type=int, default=3,
+                        help="Runs per case; the best time of each stage counts")
+    parser.add_argument("-t", "--threshold", type=float, default=THRESHOLD,
+                        help="Fail when a stage is this much slower or bigger than its baseline")
+    parser.add_argument("--baseline", type=int, default=BASELINE_RUNS,
+                        help="Earlier runs the baseline median is taken over")
+    parser.add_argument("--seed", type=int, default=SEED, help="Generator seed")
+    parser.add_argument("--history", default=HISTORY_PATH, help="JSON history file")
+    parser.add_argument("--no-record", action="store_true",
+                        help="Compare against the history without adding this run")
+    parser.add_argument("--generate", action="store_true",
+                        help="Only generate the files for the selected cases")
+    args = parser.parse_args()
+
+    if args.generate:
+        for kind, rows, cols in cases(args.kind, [parse_count(r) for r in args.rows], args.cols):
+            print(ensure_file(kind, rows, cols, args.seed))
+    else:
+        run_bench(args)
@@ -0,0 +1,255 @@
+"""Monthly climatology statistics shared by the weather plot scripts.
+
+A spec is a list of Stat entries. Each names a variable, how its hourly
+values become one value per local day (`daily`) and how those become one
+value per month (`monthly`), optionally with a band of ±1 std of the daily
+values. All entries are computed together: one group-by over the hourly data
+makes every daily aggregate the spec needs, and one group-by over the small
+daily frame makes every monthly value. Adding a chart is one more Stat, not
+another fetch or pass.
+
+daily_normals() computes multi-year day-of-year normals (mean, std,
+percentiles, records) the same way, streaming the archive one year at a time.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import polars as pl
+
+import profiling
+from weather_archive import scan, update
+from weather_fetch import ARCHIVE_URL
+
+AGGS = ("mean", "max", "min", "sum")
+
+# Axis labels; variables in CONVERSIONS use the converted unit instead
+UNITS = {
+    "temperature_2m": "°F",
+    "relative_humidity_2m": "%",
+    "precipitation": "mm",
+    "rain": "mm",
+    "snowfall": "mm",
+    "snow_depth": "cm",
+    "wind_speed_10m": "m/s",
+    "wind_direction_10m": "°",
+}
+
+# Display conversions, applied to the hourly values before aggregating
+CONVERSIONS = {
+    "temperature_2m": (lambda v: v * 9 / 5 + 32, "°F"),
+    "precipitation": (lambda v: v / 25.4, "in"),  # mm → inches
+    "rain": (lambda v: v / 25.4, "in"),
+    "snowfall": (lambda v: v / 25.4, "in"),
+}
+
+
+@dataclass(frozen=True)
+class Stat:
+    variable: str
+    daily: str = "mean"
+    monthly: str = "mean"
+    band: bool = False
+    name: str | None = None
+
+    @property
+    def key(self):
+        return self.name or f"{self.variable}_{self.daily}_{self.monthly}"
+
+
+def unit_for(variable):
+    if variable in CONVERSIONS:
+        return CONVERSIONS[variable][1]
+    return UNITS.get(variable, "")
+
+
+def converted(variables):
+    """Value expression with the display conversion of each variable applied."""
+    value = pl.col("value").cast(pl.Float64)
+    expr = value
+    for var in variables:
+        if var in CONVERSIONS:
+            expr = pl.when(pl.col("variable") == var).then(CONVERSIONS[var][0](value)).otherwise(expr)
+    return expr
+
+
+def daily_values(hist, spec, stations):
+    """One row per station, variable and local day with each daily aggregate
+    the spec uses. `hist` is the long frame from weather_archive."""
+    for s in spec:
+        if s.daily not in AGGS or s.monthly not in AGGS:
+            raise ValueError(f"{s.key}: aggregations must be one of {AGGS}")
+
+    variables = sorted({s.variable for s in spec})
+    aggs = [getattr(pl.col("value"), a)().alias(a) for a in sorted({s.daily for s in spec})]
+    parts = [
+        hist.lazy()
+        .filter((pl.col("station") == st.name) & pl.col("variable").is_in(variables))
+        .with_columns(
+            pl.col("date").dt.convert_time_zone(st.timezone).dt.date().alias("day"),
+            converted(variables).alias("value"),
+        )
+        .group_by("station", "variable", "day")
+        .agg(aggs)
+        for st in stations
+    ]
+    return pl.concat(parts)
+
+
+def monthly_stats(hist, spec, stations):
+    """Tidy frame of every Stat in the spec for every station.
+
+    Columns: station, series (Stat.key), variable, unit, month (month-end
+    date), value and std (null unless the Stat has a band).
+    """
+    daily = daily_values(hist, spec, stations).with_columns(
+        pl.col("day").dt.month_end().alias("month")
+    )
+
+    exprs = []
+    for s in spec:
+        values = pl.col(s.daily).filter(pl.col("variable") == s.variable)
+        exprs.append(getattr(values, s.monthly)().alias(s.key))
+        if s.band:
+            exprs.append(values.std().alias(f"{s.key}__std"))
+    wide = profiling.collect(
+        daily.group_by("station", "month").agg(exprs).sort("station", "month"), "monthly stats"
+    )
+
+    return pl.concat([
+        wide.select(
+            "station",
+            pl.lit(s.key).alias("series"),
+            pl.lit(s.variable).alias("variable"),
+            pl.lit(unit_for(s.variable)).alias("unit"),
+            "month",
+            pl.col(s.key).cast(pl.Float64).alias("value"),
+            (pl.col(f"{s.key}__std") if s.band else pl.lit(None)).cast(pl.Float64).alias("std"),
+        )
+        for s in spec
+    ])
+
+
+# ---------- Normals ----------
+
+PERCENTILES = (10, 50, 90)
+
+# Histogram range and bin width for percentiles, in display units
+HIST_BINS = {"temperature_2m": (-80.0, 140.0, 0.1)}
+DEFAULT_BINS = (-100.0, 500.0, 0.1)
+
+DAYS = 366
+
+
+class DoyAccumulator:
+    """Per day-of-year count, sum, sum of squares, min/max (with their year)
+    and a fixed-bin histogram of one daily series.
+
+    Memory depends only on the bins, so any number of years can be folded
+    in one at a time. Percentiles are accurate to half a bin.
+    """
+
+    def __init__(self, lo, hi, width):
+        self.lo, self.width = lo, width
+        self.bins = int(round((hi - lo) / width))
+        self.count = np.zeros(DAYS, dtype=np.int64)
+        self.sum = np.zeros(DAYS)
+        self.sumsq = np.zeros(DAYS)
+        self.min = np.full(DAYS, np.inf)
+        self.max = np.full(DAYS, -np.inf)
+        self.min_year = np.zeros(DAYS, dtype=np.int32)
+        self.max_year = np.zeros(DAYS, dtype=np.int32)
+        self.hist = np.zeros((DAYS, self.bins), dtype=np.int32)
+
+    def add(self, doy, values, year):
+        """Fold in one year: `doy` 1..366 (leap-year calendar) and values."""
+        ok = ~np.isnan(values)
+        day, v = doy[ok].astype(np.int64) - 1, values[ok]
+
+        self.count += np.bincount(day, minlength=DAYS)
+        self.sum += np.bincount(day, weights=v, minlength=DAYS)
+        self.sumsq += np.bincount(day, weights=v * v, minlength=DAYS)
+
+        lo = np.full(DAYS, np.inf)
+        hi = np.full(DAYS, -np.inf)
+        np.minimum.at(lo, day, v)
+        np.maximum.at(hi, day, v)
+        self.min_year[lo < self.min] = year
+        self.max_year[hi > self.max] = year
+        self.min = np.minimum(self.min, lo)
+        self.max = np.maximum(self.max, hi)
+
+        b = np.clip(((v - self.lo) / self.width).astype(np.int64), 0, self.bins - 1)
+        self.hist += np.bincount(day * self.bins + b, minlength=DAYS * self.bins).reshape(
+            DAYS, self.bins
+        ).astype(np.int32)
+
+    def percentile(self, q):
+        """Nearest-rank q-th percentile per day (bin centre)."""
+        cum = self.hist.cumsum(axis=1)
+        idx = (cum < (q / 100 * self.count)[:, None]).sum(axis=1)
+        return np.where(self.count > 0, self.lo + (idx + 0.5) * self.width, np.nan)
+
+    def frame(self):
+        n = self.count.astype(float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self.sum / n
+            std = np.sqrt(np.maximum(self.sumsq - self.sum * mean, 0) / (n - 1))
+        empty = self.count == 0
+        return pl.DataFrame({
+            "doy": np.arange(1, DAYS + 1, dtype=np.int32),
+            "count": self.count,
+            "mean": np.where(empty, np.nan, mean),
+            "std": np.where(self.count > 1, std, np.nan),
+            **{f"p{q}": self.percentile(q) for q in PERCENTILES},
+            "record_low": np.where(empty, np.nan, self.min),
+            "record_low_year": self.min_year,
+            "record_high": np.where(empty, np.nan, self.max),
+            "record_high_year": self.max_year,
+        })
+
+
+def daily_normals(station, first_year, last_year, spec, client=None, url=ARCHIVE_URL):
+    """Day-of-year normals of each Stat's daily series over whole years.
+
+    Missing years are fetched into the archive up front (concurrently, each
+    stored as it arrives); the years are then read back and folded in one at
+    a time, so only one year of hourly data is ever in memory. `client` and
+    `url` go to weather_fetch, e.g. to run from a stub server or recorded
+    responses. Tidy result: station, series,
+    variable, unit, doy, date (in leap year 2000, for plotting), count,
+    mean, std, percentiles and record low/high with their years.
+    """
+    start, end = f"{first_year}-01-01", f"{last_year}-12-31"
+    variables = sorted({s.variable for s in spec})
+    update([station], start, end, variables, client, url=url)
+
+    accs = {s.key: DoyAccumulator(*HIST_BINS.get(s.variable, DEFAULT_BINS)) for s in spec}
+    for year in range(first_year, last_year + 1):
+        hist = scan([station], f"{year}-01-01", f"{year}-12-31", variables)
+        daily = profiling.collect(
+            daily_values(hist, spec, [station]).with_columns(
+                pl.date(2000, pl.col("day").dt.month(), pl.col("day").dt.day())
+                .dt.ordinal_day()
+                .alias("doy")
+            ),
+            "daily values",
+            year=year,
+        )
+        with profiling.stage("accumulate", year=year):
+            for s in spec:
+                part = daily.filter(pl.col("variable") == s.variable)
+                accs[s.key].add(part["doy"].to_numpy(), part[s.daily].to_numpy().astype(float), year)
+
+    return pl.concat([
+        accs[s.key].frame().select(
+            pl.lit(station.name).alias("station"),
+            pl.lit(s.key).alias("series"),
+            pl.lit(s.variable).alias("variable"),
+            pl.lit(unit_for(s.variable)).alias("unit"),
+            "doy",
+            (pl.date(2000, 1, 1) + pl.duration(days=pl.col("doy") - 1)).alias("date"),
+            pl.exclude("doy"),
+        )
+        for s in spec
+    ])
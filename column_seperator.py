@@ -1,42 +1,66 @@
 #!/home/thomas/dev/python/scripts/tools/.venv
 
-import polars as pl
+import glob
 import os
 import sys
 
+import polars as pl
+
+import toa5
+from fuzzy_search import EXTENSIONS, parse_name
+from logger_cache import sniff_layout
+
 """Script for quick column creation for pasting into central servers when creating station apps"""
 
-cp = os.getcwd()
-file_name = sys.argv[1]
-station, agg = file_name.rsplit('_', 1)
+# Not part of a station app's column list
+SKIP = {"TIMESTAMP", "RECORD"}
 
-if len(sys.argv) > 1:
-    file = pl.scan_csv(f'{cp}/{file_name}', has_header=True, raise_if_empty=True,
-                       ignore_errors=True)  # , skip_lines=1, truncate_ragged_lines=True)
 
-    # print(file.collect())
+def header_columns(file_path):
+    """Column names from the header alone; the data body is never parsed."""
+    header = toa5.read_header(file_path)
+    if header is not None:
+        # TOA5 names come straight from the header lines
+        return list(header.columns)
+    # No schema inference, so only the first line is read
+    schema = pl.scan_csv(
+        file_path, infer_schema_length=0, truncate_ragged_lines=True, **sniff_layout(file_path)
+    ).collect_schema()
+    return [c.strip() for c in schema.names()]
+
 
+def expand(paths):
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files += sorted(
+                os.path.join(p, f) for f in os.listdir(p) if f.lower().endswith(EXTENSIONS)
+            )
+        elif glob.has_magic(p):
+            files += sorted(glob.glob(p))
+        else:
+            files.append(p)
+    return files
+
+
+if len(sys.argv) > 1:
+    files = expand(sys.argv[1:])
 else:
     print("Need to add a dat or csv file as an argument to the script")
     sys.exit()
 
-file = file.collect()
-# print('df:', file)
-
-first_row = file.row(0)
-# print('first row:', first_row)
-
-if any(isinstance(station, str) for station in first_row):
-    df = file.slice(1)
+for file_path in files:
+    try:
+        columns = header_columns(file_path)
+    except Exception as e:
+        print(f"❌ {file_path}: {e}")
+        continue
 
-columns = df.columns
-test = file.columns
-# print('columns:', test)
+    # print('columns:', columns)
 
-for col in columns:
-    if col == 'TIMESTAMP':
-        col.strip('TIMESTAMP')
-    elif col == 'RECORD':
-        col.strip('RECORD')
+    line = " ".join(col for col in columns if col not in SKIP)
+    if len(files) > 1:
+        station, table, _ = parse_name(os.path.basename(file_path))
+        print(f"{station} {table}: {line}")
     else:
-        print(col, end=" ")
+        print(line)
@@ -1,14 +1,40 @@
+# /// script
+# requires-python = ">=3.12"
+# dependencies = [
+#     "polars>=1,<2",
+#     "simple-term-menu",
+# ]
+# ///
+
 import os
 import sys
 import argparse
 import glob
+import time
 import zipfile
-from datetime import datetime
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import polars as pl
-from polars.exceptions import ColumnNotFoundError, SchemaError
+from polars.exceptions import (
+    ColumnNotFoundError,
+    ComputeError,
+    InvalidOperationError,
+    SchemaError,
+)
 from simple_term_menu import TerminalMenu
 
+import fuzzy_search
+import profiling
+import toa5
+from datetime_formats import (
+    DATETIME_FORMATS,
+    SAMPLE_ROWS,
+    datetime_expr,
+    detect_datetime_formats,
+    unparsed_timestamps,
+)
+
 HOME = os.getenv("HOME")
 DOWNLOADS = f"{HOME}/Downloads"
 
@@ -37,147 +63,481 @@ schema = {
     "column_21": pl.Int8,
 }
 
+OUTPUT_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Candidates shown in the menu for --find
+FIND_LIMIT = 30
+
+
+def parse_datetime(df_csv, formats):
+    """Parse column_1 to a datetime, strictly when there is one format. It
+    stays typed; the writers format it with OUTPUT_DATETIME_FORMAT."""
+    return df_csv.with_columns(datetime_expr(formats, strict=True).alias("column_1"))
+
+
+def is_bam(file_path):
+    return any(x in file_path.lower() for x in ["pm10", "pm2.5", "bam"])
+
+
+def padded_columns(source, skip_rows=0, n=SAMPLE_ROWS):
+    """Columns with leading or trailing whitespace in the first n rows."""
+    # A lazy head reads only the first rows; read_csv(n_rows=...) loads the file
+    sample = (
+        pl.scan_csv(source, has_header=False, skip_rows=skip_rows, infer_schema=False)
+        .head(n)
+        .collect()
+    )
+    flags = sample.select(pl.all().str.contains(r"^\s|\s$").any()).row(0)
+    return [c for c, padded in zip(sample.columns, flags) if padded]
+
+
+def scan_file(file_path, sample_rows=SAMPLE_ROWS, strip_all=False, source=None):
+    """Lazy scan of one raw file with only the padded columns stripped.
+
+    BAM files laid out as `schema` are typed: every column not padded in the
+    sample is parsed to its dtype by the CSV reader itself, so only padded
+    ones go through text. `source` is the file's contents when it is not on
+    disk (a zip member); `file_path` then only names it. Returns (scan,
+    stripped frame, padded, typed).
+    """
+    source = file_path if source is None else source
+    skip_rows = toa5.HEADER_ROWS if toa5.is_toa5(source) else 0
+    options = dict(
+        separator=",",
+        has_header=False,
+        # TOA5 header lines are skipped rather than needing manual removal
+        skip_rows=skip_rows,
+        raise_if_empty=True,
+    )
+    df_file = pl.scan_csv(source, infer_schema_length=10000, infer_schema=False, **options)
+    col = df_file.collect_schema().names()
+    padded = col if strip_all else padded_columns(source, skip_rows, sample_rows)
+
+    typed = is_bam(file_path) and col == list(schema)
+    if typed:
+        df_file = pl.scan_csv(
+            source,
+            schema={c: pl.String if c in padded else dtype for c, dtype in schema.items()},
+            **options,
+        )
+    df_csv = df_file.with_columns(pl.col(c).str.strip_chars() for c in padded)
+    return df_file, df_csv, padded, typed
+
+
+def cast_schema(df_time, padded, typed):
+    """Bring a BAM frame to `schema`. A typed scan leaves only the padded
+    columns to cast; column_1 is already a datetime."""
+    if typed:
+        return df_time.with_columns(
+            pl.col(c).cast(schema[c]) for c in padded if c != "column_1"
+        )
+    return df_time.cast({c: dtype for c, dtype in schema.items() if c != "column_1"})
+
+
+def dat_layout(frame):
+    """Frame and writer options for .dat output: the timestamp first and
+    quoted, every other value bare.
+
+    When every other column is numeric the writer quotes the still typed
+    timestamp by itself; otherwise it is formatted and quoted here.
+    """
+    rest = [dtype for c, dtype in frame.collect_schema().items() if c != "column_1"]
+    if all(dtype.is_numeric() or dtype == pl.Null for dtype in rest):
+        return frame.select("column_1", pl.exclude("column_1")), {
+            "quote_style": "non_numeric",
+            "datetime_format": OUTPUT_DATETIME_FORMAT,
+        }
+    return frame.select(
+        pl.format('"{}"', pl.col("column_1").dt.strftime(OUTPUT_DATETIME_FORMAT)).alias("column"),
+        pl.exclude("column_1"),
+    ), {"quote_style": "never"}
+
 
 def read_file(args):
-    file_list = glob.glob("*.*")
+    if args.find is not None:
+        # Best matches from the file index instead of the current directory
+        file_list = [f.path for f in fuzzy_search.search(args.find, FIND_LIMIT)]
+        if not file_list:
+            print(f"❌ No indexed files match '{args.find}'.")
+            sys.exit(1)
+    else:
+        file_list = glob.glob("*.*")
     if not file_list:
         print("❌ No files found in the current directory.")
         sys.exit(1)
 
     files_menu = TerminalMenu(
         file_list,
-        title="Choose the file to convert. (.zip files will be extracted first)",
+        title="Choose the file to convert. (every file in a .zip is converted)",
     )
     selection = files_menu.show()
     file_path = file_list[selection]
 
-    # Unzip if needed
-    if file_path.endswith(".zip"):
-        target_dir = os.path.splitext(file_path)[0]
-        with zipfile.ZipFile(file_path, "r") as zip_file:
-            zip_file.extractall(target_dir)
-        print(f"✅ Extracted to {target_dir}")
-        return  # Avoid continuing on .zip directly
+    convert_file(file_path, args)
 
-    try:
-        df_file = pl.scan_csv(
-            file_path,
-            separator=",",
-            has_header=False,
-            raise_if_empty=True,
-            infer_schema_length=10000,
-            infer_schema=False,
-        )
-    except Exception as e:
-        print(f"❌ Failed to read file: {e}")
-        sys.exit(1)
 
-    col = df_file.collect_schema().names()
+def convert_file(file_path, args, source=None):
+    """Run the scan → strip → datetime → cast → write pipeline on one file.
 
-    # Strip leading/trailing characters from all string columns
-    df_csv = df_file.with_columns([pl.col(c).str.strip_chars().alias(c) for c in col])
+    Only columns padded with whitespace in the sample are stripped, BAM
+    values are parsed to their dtypes during the scan and the timestamp stays
+    typed until it is written. If a typed parse fails further into the file
+    (padding the sample did not show), the file is converted again with every
+    column stripped. If a timestamp further in does not fit the format
+    detected from the sample, the format is detected from every row instead.
+    A .zip has each of its files converted (convert_zip).
 
-    # check datetime format
-    time = df_csv.select(pl.col("column_1")).collect().row(1)
-    t = time[0]
+    Returns the number of rows written, or None if nothing was written.
+    """
+    if source is None and file_path.lower().endswith(".zip"):
+        return convert_zip(file_path, args)
 
-    # fmt = ("%Y-%m-%d %H:%M:%S", "%m/%d/%y %H:%M")
+    strip_all = full = False
+    while True:
+        try:
+            return _convert(file_path, args, strip_all, full, source)
+        except InvalidOperationError as e:
+            # A strict datetime parse or cast failed past the sample
+            if full:
+                print(f"❌ {str(e).splitlines()[0]}")
+                sys.exit(1)
+            print(f"⚠️ {str(e).splitlines()[0]}; detecting the datetime format from the whole file")
+            full = True
+        except ComputeError as e:
+            if strip_all:
+                raise
+            print(f"⚠️ Typed read failed ({str(e).splitlines()[0]}); converting again with every column stripped")
+            strip_all = True
 
-    met_fmt = "%Y-%m-%d %H:%M:%S"
-    bam_fmt = "%m/%d/%y %H:%M"
 
-    def try_parse(t, fmt):
-        try:
-            return datetime.strptime(t, fmt)
-        except ValueError:
-            return None
+def _convert(file_path, args, strip_all=False, full=False, source=None):
+    sample_rows = getattr(args, "sample_rows", SAMPLE_ROWS)
+    try:
+        with profiling.stage("scan", file_path) as s:
+            if source is not None:
+                s.bytes = len(source)
+            df_file, df_csv, padded, typed = scan_file(file_path, sample_rows, strip_all, source)
+    except Exception as e:
+        print(f"❌ Failed to read file: {e}")
+        sys.exit(1)
 
-    time = try_parse(time[0], met_fmt)
-    if time:
-        print("Matched met_fmt:", time)
-        df_time = df_csv.with_columns(
-            pl.col("column_1")
-            .str.to_datetime("%Y-%m-%d %H:%M:%S", strict=True)
-            .dt.strftime("%Y-%m-%d %H:%M:%S")
-            .alias("column_1")
+    # check datetime format
+    formats = detect_datetime_formats(df_csv, None if full else sample_rows)
+    if not formats:
+        print(
+            "Format of datetime does not match any known format. Add a new one or fix the file."
         )
+        sys.exit(1)
 
-    else:
-        time = try_parse(time[0], bam_fmt)
-        if time:
-            print("Matched bam_fmt:", time)
-
-            df_time = df_csv.with_columns(
-                pl.col("column_1")
-                .str.to_datetime("%m/%d/%y %H:%M", strict=True)
-                .dt.strftime("%Y-%m-%d %H:%M:%S")
-                .alias("column_1")
-            )
-        else:
-            print(
-                "Format of datetime does not match any known format. Add a new one or fix the file."
-            )
+    if len(formats) > 1 or full:
+        # Coalesced formats blank a value none of them fits, and a full
+        # detection has no strict parse to fall back on, so check every row
+        unparsed = unparsed_timestamps(df_csv, formats)
+        if len(unparsed) and not full:
+            print("⚠️ Timestamps past the sample fit none of its formats; detecting from the whole file")
+            formats = detect_datetime_formats(df_csv, None)
+            unparsed = unparsed_timestamps(df_csv, formats)
+        if len(unparsed):
+            examples = ", ".join(repr(v) for v in unparsed.head(3))
+            print(f"❌ {len(unparsed)} timestamps match no known format, e.g. {examples}")
+            sys.exit(1)
+
+    print("Matched", ", ".join(f"{name} ({DATETIME_FORMATS[name]})" for name in formats))
+    df_time = parse_datetime(df_csv, formats)
 
     try:
         # Only cast schema for BAM/PM files
-        if any(x in file_path.lower() for x in ["pm10", "pm2.5", "bam"]):
+        if is_bam(file_path):
             try:
-                df_time = df_time.cast(schema)
+                df_time = cast_schema(df_time, padded, typed)
             except SchemaError as e:
                 print("⚠️ Schema mismatch. Proceeding without strict casting.")
                 pass
 
-        df = df_time.collect()
+        if getattr(args, "eager", False):
+            return write_eager(df_time, file_path, args)
+        return write_streaming(df_time, file_path, args)
 
-        # Add RECORD column if needed
-        if args.rec and "column_r" not in df.columns:
-            df = df.insert_column(1, pl.Series("column_r", list(range(df.height))))
+    except ColumnNotFoundError:
+        print("⚠️ Column not found. Make sure headers are removed before converting.")
+        sys.exit(1)
 
-        # Output format selection
-        name, ext = os.path.splitext(file_path)
 
-        if args.add_col_name and args.add_col_index is not None:
-            fill_val = args.add_col_val if args.add_col_val is not None else None
-            new_col = pl.Series(args.add_col_name, [fill_val] * df.height)
+def write_eager(df_time, file_path, args):
+    """Collect the whole frame in memory, then write it. Fallback for --eager."""
+    # Profiled, this shows the time of each step (strip, datetime, cast)
+    df = profiling.collect(df_time, "transform")
 
-            try:
-                df = df.insert_column(args.add_col_index, new_col)
-                print(
-                    f"✅ Added column '{args.add_col_name}' at index {
-                        args.add_col_index
-                    }"
-                )
-            except Exception as e:
-                print(f"❌ Failed to add column: {e}")
-                sys.exit(1)
+    # Add RECORD column if needed
+    if args.rec and "column_r" not in df.columns:
+        df = df.insert_column(1, pl.Series("column_r", list(range(df.height))))
+
+    # Output format selection
+    name, ext = os.path.splitext(os.path.basename(file_path))
+    out_dir = getattr(args, "out_dir", None) or DOWNLOADS
+
+    if args.add_col_name and args.add_col_index is not None:
+        fill_val = args.add_col_val if args.add_col_val is not None else None
+        new_col = pl.Series(args.add_col_name, [fill_val] * df.height)
 
-        if args.dat:
-            df_fmt = df.select([pl.format('"{}"', pl.col("column_1")).alias("column")])
-            df_fnl = pl.concat([df_fmt, df.drop("column_1")], how="horizontal")
-            print(df_fnl)
-            df_fnl.write_csv(
-                file=f"{DOWNLOADS + '/' + name}_1.dat",
-                include_header=False,
-                quote_style="never",
+        try:
+            df = df.insert_column(args.add_col_index, new_col)
+            print(
+                f"✅ Added column '{args.add_col_name}' at index {
+                    args.add_col_index
+                }"
             )
-            print(f"✅ .dat file written to {DOWNLOADS + '/' + name}_1.dat")
+        except Exception as e:
+            print(f"❌ Failed to add column: {e}")
+            sys.exit(1)
 
-        elif args.csv:
-            if ext.lower() == ".csv":
-                print("ℹ️ This is already a .csv file")
-            else:
+    if args.dat:
+        df_fnl, options = dat_layout(df)
+        print(df_fnl)
+        out_path = f"{out_dir + '/' + name}_1.dat"
+        with profiling.stage("write", out_path) as s:
+            s.rows = df_fnl.height
+            df_fnl.write_csv(file=out_path, include_header=False, **options)
+        print(f"✅ .dat file written to {out_dir + '/' + name}_1.dat")
+
+    elif args.csv:
+        if ext.lower() == ".csv":
+            print("ℹ️ This is already a .csv file")
+            return None
+        else:
+            out_path = f"{out_dir + '/' + name}.csv"
+            with profiling.stage("write", out_path) as s:
+                s.rows = df.height
                 df.write_csv(
-                    file=f"{DOWNLOADS + '/' + name}.csv",
+                    file=out_path,
                     include_header=True,
                     float_scientific=False,
+                    datetime_format=OUTPUT_DATETIME_FORMAT,
                 )
-                print(f"✅ .csv file written to {DOWNLOADS + '/' + name}.csv")
+            print(f"✅ .csv file written to {out_dir + '/' + name}.csv")
+
+    else:
+        print("⚠️ No output format specified. Use --csv or --dat")
+        return None
+
+    return df.height
+
+
+def counted(lf):
+    """`lf` passing its batches through a counter, so a sink gives its row
+    count without the source being read again. Returns (frame, batch sizes)."""
+    batches = []
+
+    def count(df):
+        batches.append(df.height)
+        return df
 
+    return lf.map_batches(count, streamable=True, schema=lf.collect_schema()), batches
+
+
+def sink(plan, out_path):
+    """Run a sink plan; a write that fails part way leaves no partial file."""
+    try:
+        profiling.sink(plan, "convert", out_path)
+    except Exception:
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        raise
+
+
+def write_streaming(df_time, file_path, args):
+    """Keep the plan lazy and stream it straight to the target with sink_csv."""
+    col = df_time.collect_schema().names()
+
+    # Add RECORD column if needed
+    if args.rec and "column_r" not in col:
+        df_time = df_time.with_row_index("column_r").with_columns(
+            pl.col("column_r").cast(pl.Int64)
+        )
+        col.insert(1, "column_r")
+        df_time = df_time.select(col)
+
+    # Output format selection
+    name, ext = os.path.splitext(os.path.basename(file_path))
+    out_dir = getattr(args, "out_dir", None) or DOWNLOADS
+
+    if args.add_col_name and args.add_col_index is not None:
+        if not 0 <= args.add_col_index <= len(col):
+            print(
+                f"❌ Failed to add column: index {args.add_col_index} is out of "
+                f"range for {len(col)} columns"
+            )
+            sys.exit(1)
+        df_time = df_time.with_columns(pl.lit(args.add_col_val).alias(args.add_col_name))
+        col.insert(args.add_col_index, args.add_col_name)
+        df_time = df_time.select(col)
+        print(f"✅ Added column '{args.add_col_name}' at index {args.add_col_index}")
+
+    if args.dat:
+        df_fnl, options = dat_layout(df_time)
+        df_fnl, batches = counted(df_fnl)
+        out_path = f"{out_dir + '/' + name}_1.dat"
+        # Scan, strip, datetime, cast and write run as one streamed stage
+        sink(df_fnl.sink_csv(out_path, include_header=False, lazy=True, **options), out_path)
+        print(f"✅ .dat file written to {out_dir + '/' + name}_1.dat")
+
+    elif args.csv:
+        if ext.lower() == ".csv":
+            print("ℹ️ This is already a .csv file")
+            return None
+        out_path = f"{out_dir + '/' + name}.csv"
+        df_fnl, batches = counted(df_time)
+        sink(
+            df_fnl.sink_csv(
+                out_path,
+                include_header=True,
+                float_scientific=False,
+                datetime_format=OUTPUT_DATETIME_FORMAT,
+                lazy=True,
+            ),
+            out_path,
+        )
+        print(f"✅ .csv file written to {out_dir + '/' + name}.csv")
+
+    else:
+        print("⚠️ No output format specified. Use --csv or --dat")
+        return None
+
+    return sum(batches)
+
+
+# ---------- Zip archives ----------
+
+
+def zip_members(zip_path):
+    """Files in an archive, without folders, nested zips or macOS metadata."""
+    with zipfile.ZipFile(zip_path) as zip_file:
+        return [
+            info.filename
+            for info in zip_file.infolist()
+            if not info.is_dir()
+            and not info.filename.lower().endswith(".zip")
+            and not info.filename.startswith("__MACOSX/")
+            and not os.path.basename(info.filename).startswith(".")
+        ]
+
+
+def member_names(members):
+    """Name each member's outputs after its file name, or after its path in
+    the archive when two members share a file name."""
+    counts = Counter(os.path.basename(m) for m in members)
+    return {
+        m: os.path.basename(m) if counts[os.path.basename(m)] == 1 else m.replace("/", "_")
+        for m in members
+    }
+
+
+def convert_member(zip_path, member, name, args):
+    """Convert one archive member from memory; nothing is extracted."""
+    with zipfile.ZipFile(zip_path) as zip_file:
+        data = zip_file.read(member)
+    return convert_file(name, args, source=data)
+
+
+def zip_jobs(zip_path, args):
+    """(zip, member, name) jobs for the members of an archive."""
+    members = zip_members(zip_path)
+    if args.csv and not args.dat:
+        members = [m for m in members if not m.lower().endswith(".csv")]
+    names = member_names(members)
+    return [(zip_path, m, names[m]) for m in members]
+
+
+def convert_zip(zip_path, args):
+    """Convert every file in an archive in parallel, each read straight out
+    of the archive; only the outputs are written to disk."""
+    jobs = zip_jobs(zip_path, args)
+    if not jobs:
+        print(f"❌ No files to convert in {zip_path}")
+        return None
+    total_rows, failed = run_jobs(jobs, args)
+    return None if len(failed) == len(jobs) else total_rows
+
+
+# ---------- Batch ----------
+
+
+def collect_batch_files(pattern):
+    """Expand a directory or glob pattern into a sorted list of convertible
+    files; archives are included and converted member by member."""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*.*")
+    return sorted(f for f in glob.glob(pattern) if os.path.isfile(f))
+
+
+def _batch_worker(file_path, member, name, args):
+    start = time.perf_counter()
+    label = f"{file_path}:{member}" if member else file_path
+    try:
+        if member:
+            rows = convert_member(file_path, member, name, args)
         else:
-            print("⚠️ No output format specified. Use --csv or --dat")
+            rows = convert_file(file_path, args)
+    except SystemExit:
+        rows = None
+    except Exception as e:
+        print(f"❌ {label}: {e}")
+        rows = None
+    return label, rows, time.perf_counter() - start
 
-    except ColumnNotFoundError:
-        print("⚠️ Column not found. Make sure headers are removed before converting.")
+
+def run_jobs(jobs, args):
+    """Convert (path, member, name) jobs in worker processes; member is None
+    for a plain file. Returns (rows written, failed labels)."""
+    workers = getattr(args, "workers", None)
+    print(f"ℹ️ Converting {len(jobs)} files with {workers or os.cpu_count()} workers")
+
+    start = time.perf_counter()
+    total_rows = 0
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if profiling.ENABLED:
+            # Stages are recorded in this process, so profile one file at a time
+            results = (_batch_worker(*job, args) for job in jobs)
+        else:
+            # Archives are opened in the workers; only paths and names are sent
+            futures = [pool.submit(_batch_worker, *job, args=args) for job in jobs]
+            results = (future.result() for future in as_completed(futures))
+        for label, rows, elapsed in results:
+            if rows is None:
+                failed.append(label)
+                print(f"❌ {label} failed after {elapsed:.2f}s")
+            else:
+                total_rows += rows
+                print(f"✅ {label}: {rows} rows in {elapsed:.2f}s")
+    wall = time.perf_counter() - start
+
+    done = len(jobs) - len(failed)
+    print(
+        f"ℹ️ {done}/{len(jobs)} files, {total_rows} rows in {wall:.2f}s "
+        f"({done / wall:.1f} files/s, {total_rows / wall:,.0f} rows/s)"
+    )
+    if failed:
+        print("⚠️ Failed files:")
+        for f in failed:
+            print(f"   {f}")
+    return total_rows, failed
+
+
+def batch_convert(args):
+    jobs = []
+    for f in collect_batch_files(args.batch):
+        if f.lower().endswith(".zip"):
+            jobs += zip_jobs(f, args)
+        elif not (args.csv and not args.dat and f.lower().endswith(".csv")):
+            # .csv inputs are already in the target format
+            jobs.append((f, None, None))
+    if not jobs:
+        print(f"❌ No files matched {args.batch}")
+        sys.exit(1)
+
+    _, failed = run_jobs(jobs, args)
+    if failed:
         sys.exit(1)
 
 
@@ -210,6 +570,64 @@ if __name__ == "__main__":
         const=float("nan"),
         help="Value to fill the new column (default is null if not specified)",
     )
+    parser.add_argument(
+        "--sample-rows",
+        type=int,
+        default=SAMPLE_ROWS,
+        help="Rows sampled to detect the datetime format and which columns need stripping",
+    )
+    parser.add_argument(
+        "--eager",
+        action="store_true",
+        help="Load the whole file into memory before writing instead of streaming",
+    )
+    parser.add_argument(
+        "-b",
+        "--batch",
+        type=str,
+        help="Convert every file in a directory or glob pattern without the menu",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes for --batch and .zip files (default: CPU count)",
+    )
+    parser.add_argument(
+        "-f",
+        "--find",
+        type=str,
+        metavar="QUERY",
+        help="Pick the file from the best fuzzy matches in the file index "
+        "instead of the current directory",
+    )
+    parser.add_argument(
+        "-o",
+        "--out-dir",
+        type=str,
+        default=DOWNLOADS,
+        help="Directory to write converted files to (default: ~/Downloads)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Report time, rows, bytes and peak memory per stage and print the "
+        "polars plans; with --eager also the time of each plan step",
+    )
+    parser.add_argument(
+        "--profile-out",
+        type=str,
+        metavar="PATH",
+        help="Also write the profile to PATH (implies --profile); "
+        "*.trace.json is written as a Chrome trace",
+    )
     args = parser.parse_args()
 
-    read_file(args)
+    if args.profile or args.profile_out:
+        profiling.enable(args.profile_out)
+
+    if args.batch:
+        batch_convert(args)
+    else:
+        read_file(args)
@@ -0,0 +1,72 @@
+"""Logger datetime formats, detected from a sample of each file.
+
+Shared by dat_formatter and logger_cache, so reading a logger file does not
+pull in the converter's command line.
+"""
+
+import polars as pl
+
+import profiling
+
+# Known logger datetime formats, scored against a sample of each file.
+# Earlier entries win ties. Add new logger formats here.
+DATETIME_FORMATS = {
+    "met": "%Y-%m-%d %H:%M:%S",
+    "bam": "%m/%d/%y %H:%M",
+    "bam_sec": "%m/%d/%y %H:%M:%S",
+    "iso_min": "%Y-%m-%d %H:%M",
+    "iso_t": "%Y-%m-%dT%H:%M:%S",
+    "us": "%m/%d/%Y %H:%M",
+    "us_sec": "%m/%d/%Y %H:%M:%S",
+}
+SAMPLE_ROWS = 1000
+
+
+def detect_datetime_formats(df_csv, n=SAMPLE_ROWS, col="column_1"):
+    """Score every registered format against the first n rows of `col`
+    (every row when n is None).
+
+    Returns the names of the formats needed to parse the sample, best first.
+    A single name means the file is uniform; several mean it mixes formats.
+    An empty list means nothing matched.
+    """
+    lf = df_csv.select(col)
+    sample = profiling.collect(lf if n is None else lf.head(n), "detect datetime")
+    parsed = sample.select(
+        pl.col(col).str.to_datetime(fmt, strict=False).is_not_null().alias(name)
+        for name, fmt in DATETIME_FORMATS.items()
+    )
+
+    # Greedily add the format that parses the most still-unmatched rows
+    formats = []
+    unmatched = pl.Series([True] * sample.height)
+    while True:
+        scores = {name: (parsed[name] & unmatched).sum() for name in DATETIME_FORMATS}
+        best = max(scores, key=scores.get)
+        if scores[best] == 0:
+            break
+        formats.append(best)
+        unmatched = unmatched & ~parsed[best]
+    return formats
+
+
+def datetime_expr(formats, col="column_1", strict=False):
+    """Typed datetime parse of `col` using the detected formats.
+
+    A single format can parse strictly, raising on a value it does not fit.
+    Several are coalesced, and a value none of them fits becomes null.
+    """
+    if len(formats) == 1:
+        return pl.col(col).str.to_datetime(DATETIME_FORMATS[formats[0]], strict=strict)
+    return pl.coalesce(
+        pl.col(col).str.to_datetime(DATETIME_FORMATS[name], strict=False)
+        for name in formats
+    )
+
+
+def unparsed_timestamps(df_csv, formats, col="column_1"):
+    """Non-empty values of `col` in the whole file that none of `formats` fit."""
+    return profiling.collect(
+        df_csv.select(col).filter(pl.col(col).is_not_null() & datetime_expr(formats, col).is_null()),
+        "check datetime",
+    )[col]
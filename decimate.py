@@ -0,0 +1,124 @@
+"""Downsampling for plotting long logger series.
+
+Both methods return indices into the original arrays, so x can be any dtype
+(floats, datetime64, text) and the plotted points are real samples. Text x
+is decimated by position; text y is not decimated.
+
+- minmax: per-bucket min and max, an envelope that keeps every spike.
+- lttb: largest-triangle-three-buckets, keeps the visual shape with one
+  point per bucket.
+"""
+
+import matplotlib.dates as mdates
+import numpy as np
+
+METHODS = ("minmax", "lttb")
+
+
+def minmax_indices(y, n_buckets):
+    """Indices of the min and max of each of `n_buckets` equal-count buckets."""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+
+    size = -(-n // n_buckets)
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = y
+    blocks = padded.reshape(n_buckets, size)
+
+    # NaNs never win; an all-NaN bucket just yields its first index
+    lo = np.where(np.isnan(blocks), np.inf, blocks).argmin(axis=1)
+    hi = np.where(np.isnan(blocks), -np.inf, blocks).argmax(axis=1)
+    base = np.arange(n_buckets) * size
+    idx = np.unique(np.concatenate([base + lo, base + hi, [0, n - 1]]))
+    return idx[idx < n]
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-triangle-three-buckets selection of `n_out` points."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # First and last points are fixed; the rest are split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    idx = np.empty(n_out, dtype=int)
+    idx[0], idx[-1] = 0, n - 1
+
+    # Mean of every bucket, used as the third triangle vertex
+    counts = np.diff(edges)
+    x_mean = np.add.reduceat(x[:-1], edges[:-1])[: len(counts)] / counts
+    y_mean = np.add.reduceat(np.nan_to_num(y[:-1]), edges[:-1])[: len(counts)] / counts
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 1 < len(counts):
+            cx, cy = x_mean[i + 1], y_mean[i + 1]
+        else:
+            cx, cy = x[-1], y[-1]
+        bx, by = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - cx) * (by - y[a]) - (x[a] - bx) * (cy - y[a]))
+        a = lo + int(np.nanargmax(area)) if np.isfinite(area).any() else lo
+        idx[i + 1] = a
+    return idx
+
+
+def decimate(x, y, n, method="minmax"):
+    """Indices of at most ~`n` points (2n for minmax) representing (x, y)."""
+    if not is_numeric(y):
+        # Text values have no min, max or area to rank points by
+        return np.arange(len(y))
+    if method == "lttb":
+        return lttb_indices(as_numeric(x), y, n)
+    if method == "minmax":
+        return minmax_indices(y, n)
+    raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+
+
+def is_numeric(a):
+    """Numbers or datetimes, as opposed to text or mixed objects."""
+    a = np.asarray(a)
+    return a.dtype.kind in "biuf" or np.issubdtype(a.dtype, np.datetime64)
+
+
+def as_numeric(x):
+    """x as floats in matplotlib's own units: date numbers for datetimes and
+    positions for text, which a categorical axis places at its index."""
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return mdates.date2num(x)
+    if not is_numeric(x):
+        return np.arange(len(x), dtype=float)
+    return x.astype(float)
+
+
+def axis_pixels(ax):
+    """Width of the axes' drawing area in screen pixels."""
+    return max(int(ax.get_window_extent().width), 100)
+
+
+class DecimatedLine:
+    """A Line2D that is re-decimated for the visible x range on every zoom/pan."""
+
+    def __init__(self, ax, x, y, method="minmax", **plot_kwargs):
+        self.ax = ax
+        self.x = np.asarray(x)
+        self.y = np.asarray(y)
+        self.x_num = as_numeric(self.x)
+        self.method = method
+
+        idx = decimate(self.x, self.y, axis_pixels(ax), method)
+        (self.line,) = ax.plot(self.x[idx], self.y[idx], **plot_kwargs)
+        ax.callbacks.connect("xlim_changed", self.update)
+
+    def update(self, ax):
+        lo, hi = ax.get_xlim()
+        start = max(np.searchsorted(self.x_num, lo) - 1, 0)
+        stop = min(np.searchsorted(self.x_num, hi) + 1, len(self.x))
+        x, y = self.x[start:stop], self.y[start:stop]
+        idx = decimate(x, y, axis_pixels(ax), self.method)
+        self.line.set_data(x[idx], y[idx])
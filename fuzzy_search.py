@@ -1,24 +1,313 @@
+"""Find logger files fast from a persistent index instead of `find` every time.
+
+The index is a SQLite file of every .dat/.csv path under the roots, with
+mtime, size and the station, table and interval parsed from the file name.
+Updates are incremental: a directory is listed again only when its own mtime
+changed (a file was added, removed or renamed in it); unchanged directories
+are skipped, and only their known subdirectories are visited. Size and mtime
+of a file edited in place are refreshed on the next full rescan (`--rebuild`).
+
+search() ranks indexed paths against a fuzzy query in-process, for scripts
+that would otherwise glob the current directory and show a menu.
+"""
+
+import argparse
 import os
+import re
+import sqlite3
 import subprocess
+from dataclasses import dataclass
 from pathlib import Path
 
+HOME = str(Path.home())
 
-def fuzzy_find_dat_file(start_dir=None):
-    start_dir = start_dir or str(Path.home())
+INDEX_PATH = os.getenv("FILE_INDEX", f"{HOME}/.cache/pyscripts/file_index.sqlite")
+ROOTS = [p for p in os.getenv("FILE_INDEX_ROOTS", HOME).split(os.pathsep) if p]
+
+EXTENSIONS = (".dat", ".csv")
+# Hidden directories and these are never indexed
+SKIP_DIRS = {"node_modules", "__pycache__", "site-packages"}
+
+# Bump when parse_name changes so indexed names are parsed again
+INDEX_VERSION = 2
+
+# Short queries can match most of the index; score only the newest this many
+MAX_CANDIDATES = 50_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime_ns INTEGER
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    mtime_ns INTEGER,
+    size INTEGER,
+    station TEXT,
+    tbl TEXT,
+    minutes INTEGER
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files(dir);
+"""
+
+
+@dataclass(frozen=True)
+class IndexedFile:
+    path: str
+    size: int
+    mtime_ns: int
+    station: str
+    table: str
+    minutes: int | None
+    score: int = 0
+
+
+# ---------- File names ----------
+
+
+def interval_minutes(token):
+    """Logging interval named by a table token (Min5, 15min, Hourly, ...)."""
+    t = token.lower()
+    if m := re.search(r"(\d+)[-_ ]?min|min(?:ute)?s?[-_ ]?(\d+)", t):
+        return int(m[1] or m[2])
+    if re.search(r"^min(ute)?$|one_?min", t):
+        return 1
+    if re.search(r"hour|^(hrs?|h)\d*$", t):
+        return 60
+    if "day" in t or "daily" in t:
+        return 1440
+    return None
 
-    # Build the 'find' command to list all .dat files
-    find_cmd = ["find", start_dir, "-type", "f", "-name", "*.dat"]
 
+def parse_name(name):
+    """(station, table, minutes) from a <station>_<table>.dat style name.
+
+    timechange outputs (<YYYYMMDD>-<minutes>-min_<original>, or without the
+    date for --incremental) keep the original's station and take their
+    interval from the prefix.
+    """
+    stem = os.path.splitext(name)[0]
+    minutes = None
+    if m := re.match(r"(?:\d{8}-)?(\d+)-min_(.+)", stem):
+        minutes, stem = int(m[1]), m[2]
+    station, _, table = stem.rpartition("_")
+    if not station:
+        station, table = stem, ""
+    return station, table, minutes or interval_minutes(table)
+
+
+# ---------- Index ----------
+
+
+def connect(db_path=INDEX_PATH):
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    con = sqlite3.connect(db_path)
+    con.executescript(SCHEMA)
+    if con.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+        # Forgetting every directory makes the next update list them all again
+        with con:
+            con.execute("DELETE FROM files")
+            con.execute("DELETE FROM dirs")
+            con.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+    return con
+
+
+def _drop_tree(con, path):
+    prefix = path.rstrip("/") + "/"
+    for table, col in (("files", "dir"), ("dirs", "path")):
+        con.execute(
+            f"DELETE FROM {table} WHERE {col} = ? OR substr({col}, 1, ?) = ?",
+            (path, len(prefix), prefix),
+        )
+
+
+def _rescan_dir(con, path, mtime_ns):
+    """List one directory, replace its file rows; return its subdirectories."""
+    subdirs, rows = [], []
     try:
-        # Pipe the output of find to fzf
-        find_proc = subprocess.Popen(find_cmd, stdout=subprocess.PIPE)
+        entries = list(os.scandir(path))
+    except OSError:
+        return []
+    for e in entries:
+        try:
+            if e.is_dir(follow_symlinks=False):
+                if not e.name.startswith(".") and e.name not in SKIP_DIRS:
+                    subdirs.append(e.path)
+            elif e.name.lower().endswith(EXTENSIONS) and e.is_file():
+                st = e.stat()
+                rows.append((e.path, path, e.name, st.st_mtime_ns, st.st_size, *parse_name(e.name)))
+        except OSError:
+            continue
+
+    con.execute("DELETE FROM files WHERE dir = ?", (path,))
+    con.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    known = {r[0] for r in con.execute("SELECT path FROM dirs WHERE parent = ?", (path,))}
+    for gone in known - set(subdirs):
+        _drop_tree(con, gone)
+    con.execute(
+        "INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)",
+        (path, os.path.dirname(path), mtime_ns),
+    )
+    return subdirs
+
+
+def update_index(roots=None, db_path=INDEX_PATH, full=False):
+    """Bring the index up to date for `roots`; returns (dirs visited, dirs listed)."""
+    visited = listed = 0
+    con = connect(db_path)
+    with con:
+        for root in roots or ROOTS:
+            stack = [os.path.abspath(root)]
+            while stack:
+                path = stack.pop()
+                visited += 1
+                try:
+                    mtime_ns = os.stat(path).st_mtime_ns
+                except OSError:
+                    _drop_tree(con, path)
+                    continue
+                row = con.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (path,)).fetchone()
+                if row and row[0] == mtime_ns and not full:
+                    stack.extend(
+                        r[0] for r in con.execute("SELECT path FROM dirs WHERE parent = ?", (path,))
+                    )
+                    continue
+                listed += 1
+                stack.extend(_rescan_dir(con, path, mtime_ns))
+    con.close()
+    return visited, listed
+
+
+# ---------- Ranking ----------
+
+BOUNDARY = "/_-. "
+
+
+def match_score(term, text):
+    """fzf-style score of `term` as a subsequence of `text`, or None.
+
+    The tightest window ending at the leftmost complete match is scored:
+    points per character, bonuses for consecutive characters and word
+    boundaries, small penalties for gaps.
+    """
+    q, t = term.lower(), text.lower()
+    i = 0
+    for end, ch in enumerate(t):
+        if ch == q[i]:
+            i += 1
+            if i == len(q):
+                break
+    else:
+        return None
+
+    positions = []
+    i = len(q) - 1
+    for pos in range(end, -1, -1):
+        if t[pos] == q[i]:
+            positions.append(pos)
+            i -= 1
+            if i < 0:
+                break
+    positions.reverse()
+
+    score, prev = 0, None
+    for p in positions:
+        score += 16
+        if p == 0 or t[p - 1] in BOUNDARY:
+            score += 8
+        if prev is not None:
+            score += 12 if p == prev + 1 else -min(p - prev - 1, 10)
+        prev = p
+    return score
+
+
+def path_score(terms, path):
+    """Sum of term scores; a term found in the file name beats one in the directory."""
+    name = os.path.basename(path)
+    total = 0
+    for term in terms:
+        s = match_score(term, name)
+        if s is not None:
+            s += 20
+        else:
+            s = match_score(term, path)
+            if s is None:
+                return None
+        total += s
+    return total
+
+
+def _like(term):
+    escaped = [c.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") for c in term]
+    return "%" + "%".join(escaped) + "%"
+
+
+def search(query="", limit=20, roots=None, exts=EXTENSIONS, station=None,
+           minutes=None, db_path=INDEX_PATH, refresh=True):
+    """Indexed files under `roots` best matching `query`, best first.
+
+    Space-separated terms must all match. `station` and `minutes` filter on
+    the parsed file name. With an empty query the newest files come first.
+    """
+    roots = [os.path.abspath(r) for r in roots or ROOTS]
+    if refresh:
+        update_index(roots, db_path)
+
+    where, params = [], []
+    where.append("(" + " OR ".join("substr(path, 1, ?) = ?" for _ in roots) + ")")
+    for r in roots:
+        prefix = r.rstrip("/") + "/"
+        params += [len(prefix), prefix]
+    where.append("(" + " OR ".join("lower(name) LIKE ?" for _ in exts) + ")")
+    params += [f"%{e.lower()}" for e in exts]
+    terms = query.split()
+    for term in terms:
+        where.append("path LIKE ? ESCAPE '\\'")
+        params.append(_like(term))
+    if station is not None:
+        where.append("station = ?")
+        params.append(station)
+    if minutes is not None:
+        where.append("minutes = ?")
+        params.append(minutes)
+
+    con = connect(db_path)
+    rows = con.execute(
+        "SELECT path, size, mtime_ns, station, tbl, minutes FROM files "
+        f"WHERE {' AND '.join(where)} ORDER BY mtime_ns DESC LIMIT ?",
+        (*params, MAX_CANDIDATES if terms else (limit or -1)),
+    ).fetchall()
+    con.close()
+
+    ranked = []
+    for row in rows:
+        score = path_score(terms, row[0]) if terms else 0
+        if score is not None:
+            ranked.append(IndexedFile(*row, score=score))
+    # Stable sort keeps newer files first among equal scores
+    ranked.sort(key=lambda f: (-f.score, len(f.path)))
+    return ranked[:limit]
+
+
+# ---------- Interactive ----------
+
+
+def fuzzy_find_dat_file(start_dir=None):
+    start_dir = start_dir or HOME
+    files = search(limit=None, roots=[start_dir], exts=(".dat",))
+
+    try:
+        # Feed the indexed paths, newest first, to fzf
         fzf_proc = subprocess.run(
             ["fzf", "--prompt", "Select a .dat file: "],
-            stdin=find_proc.stdout,
+            input="\n".join(f.path for f in files),
             text=True,
             stdout=subprocess.PIPE
         )
-        find_proc.stdout.close()  # Allow find to receive SIGPIPE
 
         selected = fzf_proc.stdout.strip()
         if selected:
@@ -34,6 +323,20 @@ def fuzzy_find_dat_file(start_dir=None):
 
 # 🧪 Example usage
 if __name__ == "__main__":
-    selected_file = fuzzy_find_dat_file()
-    if selected_file:
-        print(selected_file)
+    parser = argparse.ArgumentParser(description="Find logger files from the file index.")
+    parser.add_argument("query", nargs="*", help="Fuzzy query (default: pick with fzf)")
+    parser.add_argument("-r", "--root", action="append", help="Directory to index and search")
+    parser.add_argument("-n", "--limit", type=int, default=20, help="Number of results")
+    parser.add_argument("--rebuild", action="store_true", help="Rescan every directory")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        visited, listed = update_index(args.root, full=True)
+        print(f"✅ Indexed {listed} directories")
+    if args.query:
+        for f in search(" ".join(args.query), args.limit, args.root):
+            print(f.path)
+    elif not args.rebuild:
+        selected_file = fuzzy_find_dat_file(args.root[0] if args.root else None)
+        if selected_file:
+            print(selected_file)
@@ -0,0 +1,159 @@
+"""Parse-once Arrow IPC cache for logger CSV/.dat files, shared by the scripts.
+
+A file is parsed into a typed polars frame (datetime time column, numeric
+value columns) the first time it is opened, written to an uncompressed Arrow
+IPC file and memory-mapped on every later open. Entries are keyed by path,
+mtime and size, so an edited or re-exported file is simply a new entry.
+The cache is size-bounded and evicts the least recently used entries.
+"""
+
+import hashlib
+import os
+
+import polars as pl
+
+import toa5
+from datetime_formats import datetime_expr, detect_datetime_formats
+
+HOME = os.getenv("HOME")
+
+CACHE_DIR = os.getenv("LOGGER_CACHE_DIR", f"{HOME}/.cache/pyscripts/loggers")
+CACHE_MAX_BYTES = int(os.getenv("LOGGER_CACHE_MAX_MB", "2048")) * 1024 * 1024
+CACHE_ENABLED = os.getenv("LOGGER_CACHE", "1") != "0"
+
+# Bump when parse_logger output changes so stale entries are not reused
+PARSER_VERSION = 3
+
+# pandas' default NA strings plus Campbell's NAN
+NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a",
+    "nan", "null", "NAN",
+]
+
+
+# ---------- Parsing ----------
+
+
+def sniff_layout(file_path):
+    """Work out the header layout from the first line of the file."""
+    with open(file_path, "rb") as f:
+        first = f.readline().decode(errors="replace")
+    first_field = first.split(",", 1)[0].strip().strip('"')
+
+    probe = pl.LazyFrame({"column_1": [first_field]})
+    if detect_datetime_formats(probe, n=1):
+        # Headerless export (BAM, .dat): data starts on the first line
+        return {"has_header": False}
+    return {"has_header": True}
+
+
+def parse_logger(file_path):
+    """Read a logger file into a typed frame with a parsed time column."""
+    header = toa5.read_header(file_path)
+    if header is not None:
+        # Typed straight from the TOA5 units/processing rows
+        return toa5.scan_toa5(file_path, header=header).collect()
+
+    df = pl.read_csv(
+        file_path,
+        null_values=NA_VALUES,
+        infer_schema_length=10000,
+        truncate_ragged_lines=True,
+        **sniff_layout(file_path),
+    )
+    df = df.rename({c: c.strip() for c in df.columns})
+    df = df.with_columns(pl.col(pl.String).str.strip_chars())
+
+    time_col = "TIMESTAMP" if "TIMESTAMP" in df.columns else df.columns[0]
+    if df.schema[time_col] != pl.String:
+        return df
+    formats = detect_datetime_formats(df.lazy(), col=time_col)
+    if not formats:
+        return df
+
+    # Rows whose time does not parse are header junk (units, notes); once
+    # they are gone, text columns that are really numbers can be typed
+    df = df.with_columns(datetime_expr(formats, time_col).alias(time_col))
+    df = df.filter(pl.col(time_col).is_not_null())
+    casts = []
+    for c, dtype in df.schema.items():
+        if dtype != pl.String:
+            continue
+        for target in (pl.Int64, pl.Float64):
+            if df[c].cast(target, strict=False).null_count() == df[c].null_count():
+                casts.append(pl.col(c).cast(target))
+                break
+    return df.with_columns(casts)
+
+
+# ---------- Cache ----------
+
+
+def cache_key(file_path, variant=""):
+    st = os.stat(file_path)
+    raw = f"{os.path.abspath(file_path)}\0{st.st_mtime_ns}\0{st.st_size}\0{variant}\0{PARSER_VERSION}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def read_logger(file_path, parse=parse_logger, variant=""):
+    """Return the parsed frame for `file_path`, from the cache when possible.
+
+    `parse` and `variant` let a script cache its own parse of the file; use a
+    distinct `variant` for each parser.
+    """
+    if not CACHE_ENABLED:
+        return parse(file_path)
+
+    cached = os.path.join(CACHE_DIR, cache_key(file_path, variant) + ".arrow")
+    if os.path.exists(cached):
+        os.utime(cached)  # mark as recently used
+        return pl.read_ipc(cached, memory_map=True)
+
+    df = parse(file_path)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = f"{cached}.{os.getpid()}.tmp"
+    df.write_ipc(tmp, compression="uncompressed")
+    os.replace(tmp, cached)
+    evict()
+    return df
+
+
+def evict(max_bytes=CACHE_MAX_BYTES):
+    """Delete least recently used entries until the cache fits in max_bytes."""
+    try:
+        entries = [e for e in os.scandir(CACHE_DIR) if e.name.endswith(".arrow")]
+    except FileNotFoundError:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    total = sum(e.stat().st_size for e in entries)
+    for entry in entries:
+        if total <= max_bytes:
+            break
+        total -= entry.stat().st_size
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+def clear_cache():
+    evict(0)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Warm or clear the logger cache.")
+    parser.add_argument("files", nargs="*", help="Files to parse into the cache")
+    parser.add_argument("--clear", action="store_true", help="Empty the cache")
+    args = parser.parse_args()
+
+    if args.clear:
+        clear_cache()
+        print(f"✅ Cleared {CACHE_DIR}")
+    for path in args.files:
+        start = time.perf_counter()
+        df = read_logger(path)
+        print(f"✅ {path}: {df.height} rows in {time.perf_counter() - start:.3f}s")
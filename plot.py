@@ -1,4 +1,3 @@
-import polars as pl
 import sys
 import os
 import matplotlib.pyplot as plt
@@ -6,21 +5,29 @@ import matplotlib.pyplot as plt
 # import altair as alt
 from simple_term_menu import TerminalMenu
 
+import toa5
+from decimate import DecimatedLine
+from logger_cache import read_logger
+
 cp = os.getcwd()
 
+# "minmax" keeps every spike, "lttb" keeps the overall shape
+DECIMATE = "minmax"
+
 if len(sys.argv) > 1: 
     file_name = sys.argv[1]
-    file = pl.scan_csv(f'{cp}/{file_name}', has_header=True, raise_if_empty=True, ignore_errors=True)
-
-file = file.collect()
-
-first_row = file.row(0)
-
-if any(isinstance(value, str) for value in first_row):
-    df = file.slice(1)
-
-col = file.columns
-chart_len = df.height
+    path = f'{cp}/{file_name}'
+    header = toa5.read_header(path)
+    if header is None:
+        # Header junk rows are dropped by the shared parser; repeat opens are cached
+        df = read_logger(path)
+        col = df.columns
+    else:
+        # Column names from the TOA5 header; data is scanned once the axes are known
+        col = list(header.columns)
+else:
+    print("Need to add a dat or csv file as an argument to the script")
+    sys.exit()
 
 if col == []:
     print('No column names found.')
@@ -38,16 +45,26 @@ col_menu = TerminalMenu(col, title=('Choose the second y axis for the plot'))
 selectiony2 = col_menu.show()
 y2 = col[selectiony2]
 
-x = df[x].to_list()
-y1 = df[y].to_list()
-y2 = df[y2].to_list()
+if header is not None:
+    # Only the three chosen columns are parsed
+    df = toa5.scan_toa5(path, list(dict.fromkeys([x, y, y2])), header=header).collect()
+chart_len = df.height
+
+# NumPy views instead of Python lists; the lines are decimated to roughly
+# one bucket per pixel and re-decimated on zoom
+xs = df[x].to_numpy()
+ys1 = df[y].to_numpy()
+ys2 = df[y2].to_numpy()
 
 plt.xlim(1,4)
 plt.ylim(0,360)
 # Plot using matplotlib
 plt.figure(figsize=(10, 6))
-plt.plot(x, y1, label=y1, marker="o")
-plt.plot(x, y2, label=y2, marker="s")
+ax = plt.gca()
+lines = [
+    DecimatedLine(ax, xs, ys1, DECIMATE, label=y, marker="o"),
+    DecimatedLine(ax, xs, ys2, DECIMATE, label=y2, marker="s"),
+]
 
 plt.title("Data Comparison")
 plt.xlabel(x)
@@ -0,0 +1,224 @@
+"""Opt-in stage profiling shared by the scripts.
+
+Off by default, when stage() only yields a record and costs nothing. Turned
+on with --profile (dat_formatter, timechange) or PYSCRIPTS_PROFILE=1 for
+the weather scripts. Each stage then records its duration, rows, bytes
+(file size for reads and writes, in-memory size for frames) and peak RSS.
+Lazy plans print their optimized plan (explain()), and collected plans run
+through profile() so the time per plan node is shown too. A streamed sink
+has no per-node times, so it prints only its plan.
+
+The summary is printed at exit. With a trace path (--profile-out, or
+PYSCRIPTS_PROFILE=<path>) the stages are also written out: paths ending in
+.trace.json as a Chrome trace (chrome://tracing, ui.perfetto.dev), anything
+else as plain JSON.
+
+Stages may nest (a read that detects the datetime format); only the
+outermost one restarts the peak RSS count, so a nested stage's peak counts
+from the start of its parent. A stage that repeats (per year, per file)
+prints its plan once; the trace has every run.
+"""
+
+import atexit
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+
+ENABLED = False
+TRACE_PATH = None
+
+_stages = []
+_depth = 0
+# Plans already printed; a repeated stage (one per year, file, ...) prints once
+_shown = set()
+_t0 = time.perf_counter()
+_started = datetime.now()
+
+
+@dataclass
+class Stage:
+    name: str
+    start: float = 0.0  # seconds since profiling was enabled
+    seconds: float = 0.0
+    rows: int | None = None
+    bytes: int | None = None
+    peak_rss_mb: float | None = None
+    depth: int = 0  # number of enclosing stages
+    info: dict = field(default_factory=dict)
+    # (node, start µs, end µs) from polars profile(), relative to the stage
+    nodes: list = field(default_factory=list)
+
+    def frame(self, df):
+        """Take rows and in-memory size from a polars or pandas frame."""
+        self.rows = len(df)
+        if hasattr(df, "estimated_size"):
+            self.bytes = df.estimated_size()
+        else:
+            self.bytes = int(df.memory_usage(index=True).sum())
+        return df
+
+
+# ---------- Memory ----------
+
+
+def reset_peak_rss():
+    """Restart the peak RSS count (Linux); elsewhere peaks are per process."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on Linux, bytes on macOS
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+# ---------- Stages ----------
+
+
+def enable(trace_path=None):
+    """Start recording; the report (and trace) is written at exit."""
+    global ENABLED, TRACE_PATH, _t0, _started
+    if not ENABLED:
+        _t0, _started = time.perf_counter(), datetime.now()
+        atexit.register(finish)
+    ENABLED = True
+    TRACE_PATH = trace_path or TRACE_PATH
+
+
+@contextmanager
+def stage(name, path=None, **info):
+    """Time one pipeline stage. `path` is a file whose size is the stage's
+    bytes, taken at the end so it works for outputs too."""
+    global _depth
+    s = Stage(name, depth=_depth, info=info)
+    if not ENABLED:
+        yield s
+        return
+
+    if not _depth:
+        reset_peak_rss()
+    _depth += 1
+    start = time.perf_counter()
+    try:
+        yield s
+    finally:
+        _depth -= 1
+        s.start = start - _t0
+        s.seconds = time.perf_counter() - start
+        s.peak_rss_mb = round(peak_rss_mb(), 1)
+        if path is not None and s.bytes is None and os.path.exists(path):
+            s.bytes = os.path.getsize(path)
+            s.info.setdefault("path", path)
+        _stages.append(s)
+
+
+def explain(lf, name):
+    if ENABLED and name not in _shown:
+        print(f"ℹ️ {name} plan:\n{lf.explain()}")
+
+
+def collect(lf, name, path=None, **info):
+    """lf.collect(), or when profiling a profile() of it with the plan and
+    per-node times printed."""
+    if not ENABLED:
+        return lf.collect()
+
+    explain(lf, name)
+    with stage(name, path, **info) as s:
+        df, timings = lf.profile()
+        s.frame(df)
+    s.nodes = timings.rows()
+    if name not in _shown:
+        print(f"ℹ️ {name} node times (µs):\n{timings}")
+        _shown.add(name)
+    return df
+
+
+def sink(plan, name, path, **info):
+    """Run a lazy sink (sink_*(..., lazy=True)) as one stage."""
+    explain(plan, name)
+    _shown.add(name)
+    with stage(name, path, **info):
+        plan.collect()
+
+
+# ---------- Output ----------
+
+
+def report():
+    if not _stages:
+        return
+    print("ℹ️ Profile:")
+    print(f"   {'stage':<32} {'seconds':>9} {'rows':>12} {'MB':>9} {'peak RSS MB':>12}")
+    # In start order, so nested stages follow their parent
+    for s in sorted(_stages, key=lambda s: s.start):
+        # Repeated stages are told apart by their info (year, targets, ...)
+        label = "  " * s.depth + " ".join(
+            [s.name, *(f"{k}={v}" for k, v in s.info.items() if k != "path")]
+        )
+        rows = f"{s.rows:,}" if s.rows is not None else "-"
+        mb = f"{s.bytes / 1024**2:,.1f}" if s.bytes is not None else "-"
+        print(f"   {label:<32} {s.seconds:>9.3f} {rows:>12} {mb:>9} {s.peak_rss_mb:>12,.0f}")
+    total = sum(s.seconds for s in _stages if not s.depth)
+    print(f"   {'total':<32} {total:>9.3f}")
+
+
+def chrome_trace():
+    """Stages as complete events, with polars plan nodes nested under them."""
+    pid = os.getpid()
+    events = []
+    for s in _stages:
+        ts = s.start * 1e6
+        events.append({
+            "name": s.name, "ph": "X", "ts": ts, "dur": s.seconds * 1e6,
+            "pid": pid, "tid": 0,
+            "args": {"rows": s.rows, "bytes": s.bytes, "peak_rss_mb": s.peak_rss_mb, **s.info},
+        })
+        for node, start, end in s.nodes:
+            events.append({
+                "name": node, "ph": "X", "ts": ts + start, "dur": end - start,
+                "pid": pid, "tid": 0,
+            })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_trace(path):
+    if path.endswith(".trace.json"):
+        data = chrome_trace()
+    else:
+        data = {
+            "command": sys.argv,
+            "started": _started.isoformat(timespec="seconds"),
+            "stages": [asdict(s) for s in _stages],
+        }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=1, default=str)
+    print(f"ℹ️ Profile trace written to {path}")
+
+
+def finish():
+    report()
+    if TRACE_PATH and _stages:
+        write_trace(TRACE_PATH)
+
+
+# Weather scripts have no command line options, so they opt in from the environment
+_env = os.getenv("PYSCRIPTS_PROFILE", "")
+if _env and _env != "0":
+    enable(None if _env == "1" else _env)
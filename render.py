@@ -0,0 +1,166 @@
+"""Headless batch chart rendering for logger files.
+
+Renders the same kind of chart as plot.py without a display or menus, for
+many files and variables at once, spread over a process pool. Each worker
+draws every chart on one reused Agg figure.
+
+    python render.py data/*.dat -x TIMESTAMP -y AirT_Avg -y RH -o charts
+    python render.py --spec weekly_qa.json -j 8
+
+A spec file is a JSON list of charts, or {"defaults": {...}, "charts": [...]},
+where each chart is {"file", "x", "y": [...], optional "out", "title",
+"format", "method"}.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+
+import toa5  # noqa: E402
+from decimate import METHODS, decimate  # noqa: E402
+from logger_cache import read_logger  # noqa: E402
+
+FORMATS = ("png", "svg")
+
+_figure = None
+
+
+def load_columns(file_path, columns):
+    """Only the needed columns: pushed down for TOA5, cached parse otherwise."""
+    header = toa5.read_header(file_path)
+    if header is not None:
+        return toa5.scan_toa5(file_path, columns, header=header).collect()
+    return read_logger(file_path).select(columns)
+
+
+def get_figure():
+    """The worker's one figure, created on first use and reused afterwards."""
+    global _figure
+    if _figure is None:
+        _figure = plt.figure(figsize=(10, 6), layout="constrained")
+        _figure.add_subplot()
+    return _figure
+
+
+def output_path(chart, out_dir):
+    if chart.get("out"):
+        return chart["out"]
+    stem = os.path.splitext(os.path.basename(chart["file"]))[0]
+    name = f"{stem}_{'-'.join(chart['y'])}.{chart.get('format', 'png')}"
+    return os.path.join(out_dir, name)
+
+
+def render_chart(chart, out_dir="."):
+    """Draw one chart and save it. Returns (output path, points drawn)."""
+    fig = get_figure()
+    ax = fig.axes[0]
+    ax.clear()
+
+    x, ys = chart["x"], chart["y"]
+    df = load_columns(chart["file"], list(dict.fromkeys([x, *ys])))
+    xs = df[x].to_numpy()
+    # The axes width moves with each layout, so budget from the fixed figure width
+    pixels = int(fig.get_figwidth() * fig.dpi)
+
+    points = 0
+    for y in ys:
+        values = df[y].to_numpy()
+        idx = decimate(xs, values, pixels, chart.get("method", "minmax"))
+        ax.plot(xs[idx], values[idx], label=y)
+        points += len(idx)
+
+    ax.set_title(chart.get("title") or os.path.basename(chart["file"]))
+    ax.set_xlabel(x)
+    ax.set_ylabel(ys[0] if len(ys) == 1 else "")
+    ax.legend()
+    ax.grid(True)
+
+    out = output_path(chart, out_dir)
+    fig.savefig(out)
+    return out, points
+
+
+def _render_worker(chart, out_dir):
+    start = time.perf_counter()
+    try:
+        out, points = render_chart(chart, out_dir)
+        msg = f"✅ {out} ({points} points)"
+    except Exception as e:
+        msg = f"❌ {chart['file']} {chart['y']}: {str(e).splitlines()[0]}"
+    return msg, time.perf_counter() - start
+
+
+def load_spec(spec_path):
+    with open(spec_path) as f:
+        spec = json.load(f)
+    if isinstance(spec, list):
+        return spec
+    defaults = spec.get("defaults", {})
+    return [{**defaults, **chart} for chart in spec["charts"]]
+
+
+def charts_from_args(args):
+    files = sorted({f for pattern in args.files for f in glob.glob(pattern)})
+    groups = [[y] for y in args.y] if args.split else [args.y]
+    return [
+        {"file": f, "x": args.x, "y": ys, "format": args.format, "method": args.method}
+        for f in files
+        for ys in groups
+    ]
+
+
+def render_all(charts, out_dir, workers=None):
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_render_worker, c, out_dir) for c in charts]
+        for future in as_completed(futures):
+            msg, elapsed = future.result()
+            failed += msg.startswith("❌")
+            print(f"{msg} in {elapsed:.2f}s")
+    wall = time.perf_counter() - start
+
+    done = len(charts) - failed
+    print(f"ℹ️ {done}/{len(charts)} charts in {wall:.2f}s ({done / wall:.1f} charts/s)")
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Render logger charts to PNG/SVG without a display."
+    )
+    parser.add_argument("files", nargs="*", help="Logger files or glob patterns")
+    parser.add_argument("-x", default="TIMESTAMP", help="x axis column")
+    parser.add_argument("-y", action="append", default=[], help="y column (repeatable)")
+    parser.add_argument(
+        "--split", action="store_true", help="One chart per y column instead of one per file"
+    )
+    parser.add_argument("-s", "--spec", help="JSON spec file listing the charts")
+    parser.add_argument("-f", "--format", choices=FORMATS, default="png")
+    parser.add_argument("-m", "--method", choices=METHODS, default="minmax")
+    parser.add_argument("-o", "--out-dir", default=".", help="Output directory")
+    parser.add_argument(
+        "-j", "--workers", type=int, default=None, help="Worker processes (default: CPU count)"
+    )
+    args = parser.parse_args()
+
+    charts = load_spec(args.spec) if args.spec else []
+    if args.files:
+        if not args.y:
+            parser.error("at least one -y column is required with files")
+        charts += charts_from_args(args)
+    if not charts:
+        parser.error("nothing to render: give files with -y, or --spec")
+
+    sys.exit(1 if render_all(charts, args.out_dir, args.workers) else 0)
@@ -0,0 +1,128 @@
+"""timechange: the pandas and polars backends give the same products."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import logger_cache
+import timechange
+
+TARGETS = [15, 60, 1440]
+
+
+def as_pandas(df):
+    """Polars frame as pandas, through numpy (to_pandas needs pyarrow)."""
+    return pd.DataFrame({c: df[c].to_numpy() for c in df.columns})
+
+
+@pytest.fixture
+def station_csv(tmp_path, monkeypatch):
+    """Two weeks of 5-min station data with missing rows and NAN cells."""
+    monkeypatch.setattr(logger_cache, "CACHE_ENABLED", False)
+    rng = np.random.default_rng(7)
+    n = 4032
+    df = pd.DataFrame(
+        {
+            "TIMESTAMP": pd.date_range("2024-01-01 00:05", periods=n, freq="5min"),
+            "AirT_Avg": rng.normal(15, 8, n).round(3),
+            "RH": rng.uniform(5, 100, n).round(3),
+            "AirT_Max": rng.normal(20, 8, n).round(3),
+            "BP_Min": rng.normal(900, 5, n).round(2),
+            "Rain_Tot": rng.exponential(0.2, n).round(3),
+            "WS": rng.gamma(2, 2, n).round(3),
+            "WD": rng.uniform(0, 360, n).round(1),
+            "SigmaWD": rng.uniform(2, 40, n).round(2),
+        }
+    )
+    df = df[rng.random(n) > 0.05]
+    for col in df.columns[1:]:
+        df.loc[rng.random(len(df)) < 0.03, col] = np.nan
+
+    path = tmp_path / "Station_Min5.csv"
+    df.to_csv(path, index=False, na_rep="NAN")
+    return str(path)
+
+
+def test_read_matches(station_csv):
+    pandas_df = timechange.read_frame(station_csv, "pandas")
+    polars_df = timechange.read_frame(station_csv, "polars")
+    pd.testing.assert_frame_equal(
+        pandas_df, as_pandas(polars_df), check_dtype=False, check_exact=True
+    )
+
+
+@pytest.mark.parametrize("target", TARGETS)
+def test_resample_matches(station_csv, target):
+    pandas_res = timechange.resample(timechange.read_frame(station_csv, "pandas"), 5, target)
+    polars_res = timechange.resample(timechange.read_frame(station_csv, "polars"), 5, target)
+    pd.testing.assert_frame_equal(
+        pandas_res, as_pandas(polars_res), check_dtype=False, check_exact=True
+    )
+
+
+@pytest.mark.parametrize("backend", timechange.BACKENDS)
+def test_daily_windows_end_at_midnight(station_csv, backend):
+    res = timechange.resample(timechange.read_frame(station_csv, backend), 5, 1440)
+    # (day - 1) 00:00 < t <= day 00:00, labelled with the closing midnight
+    expected = pd.date_range("2024-01-02", "2024-01-15", freq="1440min")
+    assert list(res["TIMESTAMP"]) == list(expected)
+
+
+@pytest.mark.parametrize("target", TARGETS)
+def test_written_files_match(station_csv, tmp_path, target):
+    for backend in timechange.BACKENDS:
+        df = timechange.read_frame(station_csv, backend)
+        timechange.write_frame(timechange.resample(df, 5, target), str(tmp_path / backend))
+    assert (tmp_path / "pandas").read_bytes() == (tmp_path / "polars").read_bytes()
+
+
+@pytest.mark.parametrize("backend", timechange.BACKENDS)
+def test_cascade_matches_single_targets(station_csv, backend):
+    df = timechange.read_frame(station_csv, backend)
+    products = timechange.resample_many(df, 5, TARGETS)
+    for target in TARGETS:
+        single = timechange.resample(df, 5, target)
+        if backend == "polars":
+            assert products[target].equals(single)
+        else:
+            pd.testing.assert_frame_equal(products[target], single, check_exact=True)
+
+
+WIND_COLUMNS = (
+    "WS_ms", "WD_D1_WVT", "WD_SD1_WVT", "WD_Max", "WindDir", "WindDir_Std",
+    "WD_Std", "SigmaWD2", "WD2", "Solar_Dir", "SWDown", "SDWD",
+)
+
+
+@pytest.mark.parametrize(
+    "column, agg",
+    [
+        ("WD_D1_WVT", "vector"),
+        ("WindDir", "vector"),
+        ("WD2", "vector"),
+        ("WD_Max", "max"),
+        ("WD_SD1_WVT", "sigma"),
+        ("WindDir_Std", "sigma"),
+        ("SigmaWD2", "sigma"),
+        ("Solar_Dir", "mean"),
+        ("SWDown", "mean"),
+        # No direction column named WD: not paired, so plainly averaged
+        ("WD_Std", "mean"),
+        ("SDWD", "mean"),
+    ],
+)
+def test_agg_plan_wind_names(column, agg):
+    assert timechange.agg_plan(WIND_COLUMNS).agg[column] == agg
+
+
+def test_agg_plan_pairs_sigma_by_name():
+    pairs = timechange.agg_plan(WIND_COLUMNS).pairs
+    assert pairs["WD_SD1_WVT"] == "WD_D1_WVT"
+    assert pairs["WindDir_Std"] == "WindDir"
+    assert pairs["SigmaWD2"] == "WD2"
+
+
+def test_agg_plan_single_direction():
+    plan = timechange.agg_plan(("WD", "WS", "WD_Std", "SigmaWD"))
+    assert plan.agg == {"WD": "vector", "WS": "mean", "WD_Std": "sigma", "SigmaWD": "sigma"}
+    assert plan.pairs == {"WD": "WS", "WD_Std": "WD", "SigmaWD": "WD"}
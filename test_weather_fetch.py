@@ -0,0 +1,161 @@
+"""weather_fetch / weather_archive against canned Open-Meteo responses."""
+
+import datetime as dt
+
+import numpy as np
+import polars as pl
+import pytest
+
+import weather_archive
+import weather_fetch
+from weather_fetch import Station
+
+STATION = Station("Test", 37.6, -119.0, "UTC")
+URL = "http://open-meteo.test/v1/archive"
+
+
+class Values:
+    def __init__(self, values):
+        self.values = values
+
+    def ValuesAsNumpy(self):
+        return self.values
+
+
+class Block:
+    """Hourly() of an Open-Meteo response: an epoch time axis and one
+    float32 buffer per requested variable."""
+
+    def __init__(self, start, end, variables):
+        self.start, self.end = start, end
+        hours = np.arange((end - start) // 3600, dtype=np.float32)
+        # Hour of day, offset per variable so the columns differ
+        self.values = [hours % 24 + 100 * i for i in range(len(variables))]
+
+    def VariablesLength(self):
+        return len(self.values)
+
+    def Time(self):
+        return self.start
+
+    def TimeEnd(self):
+        return self.end
+
+    def Interval(self):
+        return 3600
+
+    def Variables(self, i):
+        return Values(self.values[i])
+
+
+class Response:
+    def __init__(self, block):
+        self.block = block
+
+    def Hourly(self):
+        return self.block
+
+
+class FakeClient:
+    """Stands in for openmeteo_requests.Client; records each request."""
+
+    def __init__(self):
+        self.requests = []
+
+    def weather_api(self, url, params):
+        self.requests.append((url, params["start_date"], params["end_date"], params["hourly"]))
+        start = dt.datetime.fromisoformat(params["start_date"]).replace(tzinfo=dt.UTC)
+        end = dt.datetime.fromisoformat(params["end_date"]).replace(tzinfo=dt.UTC)
+        block = Block(
+            int(start.timestamp()),
+            int((end + dt.timedelta(days=1)).timestamp()),
+            params["hourly"],
+        )
+        return [Response(block)]
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    monkeypatch.setattr(weather_archive, "ARCHIVE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_response_frame():
+    t0 = int(dt.datetime(2020, 1, 1, tzinfo=dt.UTC).timestamp())
+    response = Response(Block(t0, t0 + 48 * 3600, ["rain", "snowfall"]))
+    df = weather_fetch.response_frame(response, ["rain", "snowfall"])
+    assert df.columns == ["date", "rain", "snowfall"]
+    assert df.schema["date"] == pl.Datetime("us", "UTC")
+    assert df.height == 48
+    assert df["date"][0] == dt.datetime(2020, 1, 1, tzinfo=dt.UTC)
+    assert df["date"][-1] == dt.datetime(2020, 1, 2, 23, tzinfo=dt.UTC)
+    assert df["rain"][25] == 1
+    assert df["snowfall"][25] == 101
+
+
+def test_response_frame_variable_count():
+    response = Response(Block(0, 3600, ["rain"]))
+    with pytest.raises(ValueError):
+        weather_fetch.response_frame(response, ["rain", "snowfall"])
+
+
+def test_long_frame():
+    t0 = int(dt.datetime(2020, 1, 1, tzinfo=dt.UTC).timestamp())
+    wide = weather_fetch.response_frame(Response(Block(t0, t0 + 3 * 3600, ["rain"])), ["rain"])
+    df = weather_fetch.long_frame({"B": [wide], "A": [wide], "C": []})
+    assert df.columns == ["station", "date", "variable", "value"]
+    assert df["station"].to_list() == ["A"] * 3 + ["B"] * 3
+    assert df["variable"].unique().to_list() == ["rain"]
+
+    empty = weather_fetch.long_frame({})
+    assert empty.is_empty()
+    assert empty.schema == df.schema
+
+
+def test_fetch_history_years_in_order():
+    client = FakeClient()
+    stations = [Station("B", 1, 2, "UTC"), Station("A", 3, 4, "UTC")]
+    df = weather_fetch.fetch_history(
+        stations, "2019-07-01", "2021-01-31", ["rain"], client=client, url=URL
+    )
+    assert {r[:3] for r in client.requests} == {
+        (URL, "2019-07-01", "2019-12-31"),
+        (URL, "2020-01-01", "2020-12-31"),
+        (URL, "2021-01-01", "2021-01-31"),
+    }
+    assert len(client.requests) == 6
+    for _, part in df.group_by("station"):
+        assert part.height == (184 + 366 + 31) * 24
+        assert part["date"].is_sorted()
+
+
+def test_plan_gaps_splits_years(archive):
+    jobs = weather_archive.plan_gaps([STATION], "2019-11-01", "2020-02-29", ["rain", "snowfall"])
+    assert jobs == [
+        (STATION, "2019-11-01", "2019-12-31", ["rain", "snowfall"]),
+        (STATION, "2020-01-01", "2020-02-29", ["rain", "snowfall"]),
+    ]
+
+
+def test_update_fetches_only_gaps(archive):
+    client = FakeClient()
+    assert weather_archive.update([STATION], "2020-01-01", "2020-03-31", ["rain"], client, url=URL) == 1
+    assert weather_archive.read_coverage(STATION, "rain") == [
+        (dt.date(2020, 1, 1), dt.date(2020, 3, 31))
+    ]
+
+    # Covered: nothing to fetch
+    assert weather_archive.update([STATION], "2020-02-01", "2020-02-29", ["rain"], client, url=URL) == 0
+
+    # Only the uncovered tail of rain, and the new variable over the whole range
+    weather_archive.update([STATION], "2020-01-01", "2020-05-31", ["rain", "snowfall"], client, url=URL)
+    assert sorted(client.requests[1:]) == [
+        (URL, "2020-01-01", "2020-05-31", ["snowfall"]),
+        (URL, "2020-04-01", "2020-05-31", ["rain"]),
+    ]
+
+    df = weather_archive.load([STATION], "2020-01-01", "2020-05-31", ["rain", "snowfall"], client, url=URL)
+    assert len(client.requests) == 3
+    for _, part in df.group_by("variable"):
+        assert part.height == 152 * 24
+        assert part["date"].unique().len() == part.height
@@ -3,6 +3,7 @@
 # requires-python = ">=3.13"
 # dependencies = [
 #     "pandas",
+#     "polars>=1,<2",
 #     "rich",
 #     "simple-term-menu",
 # ]
@@ -10,15 +11,30 @@
 
 import sys
 import os
+import argparse
 import datetime as dt
+import functools
 import glob
+import io
+import json
 import re
+import time
+from typing import IO
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+import numpy as np
 import pandas as pd
+import polars as pl
 from rich import print as rprint
 from rich.console import Console
 from rich.theme import Theme
 from simple_term_menu import TerminalMenu
 
+import fuzzy_search
+import profiling
+import toa5
+from logger_cache import read_logger
+
 HOME = os.getenv("HOME")
 DOWNLOAD = f"{HOME}/"
 
@@ -32,48 +48,133 @@ custom_theme = Theme(
 )
 console = Console(theme=custom_theme)
 
+Frame = pd.DataFrame | pl.DataFrame
+
 # ---------- IO ----------
 
 
-def file_read(file_path: str) -> pd.DataFrame | None:
+def file_read(file_path: str | IO[bytes]) -> pd.DataFrame | None:
     try:
-        df = pd.read_csv(file_path)
-        df.columns = df.columns.str.strip()
+        skiprows = None
+        if isinstance(file_path, str) and toa5.is_toa5(file_path):
+            skiprows = toa5.PANDAS_SKIPROWS
+        with profiling.stage("read", file_path if isinstance(file_path, str) else None) as s:
+            raw = pd.read_csv(file_path, skiprows=skiprows)
+            s.rows = len(raw)
+        with profiling.stage("clean") as s:
+            df = clean_frame(raw)
+            if df is not None:
+                s.frame(df)
+        if df is None:
+            console.print("Missing TIMESTAMP column.", style="error")
+        return df
+    except Exception as e:
+        console.print(f"#1 Error occurred: {e}", style="error")
+        return None
 
-        if "STATION" in df.columns:
-            df = df.drop(columns=["STATION"])
 
-        if "TIMESTAMP" not in df.columns:
-            console.print("Missing TIMESTAMP column.", style="error")
-            return None
+def clean_frame(df: pd.DataFrame) -> pd.DataFrame | None:
+    """Parse TIMESTAMP, coerce numerics and drop empty rows. None if no TIMESTAMP."""
+    df.columns = df.columns.str.strip()
 
-        # Parse time, coerce bad rows, then clean numerics
-        df["TIMESTAMP"] = pd.to_datetime(df["TIMESTAMP"], errors="coerce")
-        df = df.dropna(subset=["TIMESTAMP"])
+    if "STATION" in df.columns:
+        df = df.drop(columns=["STATION"])
 
-        value_cols = [c for c in df.columns if c != "TIMESTAMP"]
-        for c in value_cols:
+    if "TIMESTAMP" not in df.columns:
+        return None
+
+    # Parse time, coerce bad rows, then clean numerics
+    df["TIMESTAMP"] = pd.to_datetime(df["TIMESTAMP"], errors="coerce")
+    value_cols = [c for c in df.columns if c != "TIMESTAMP"]
+    for c in value_cols:
+        # Columns read_csv already parsed as numbers need no second pass
+        if not pd.api.types.is_numeric_dtype(df[c]):
             df[c] = pd.to_numeric(df[c], errors="coerce")
 
-        # Drop rows that are entirely NaN across value columns
-        df = df.dropna(how="all", subset=value_cols)
+    # Drop rows without a time or entirely NaN across value columns, in one copy
+    keep = df["TIMESTAMP"].notna() & df[value_cols].notna().any(axis=1)
+    if not keep.all():
+        df = df[keep]
 
-        # Ensure strictly increasing index for resample
-        df = df.sort_values("TIMESTAMP").reset_index(drop=True)
-        return df
+    # Ensure strictly increasing index for resample; logger output almost
+    # always is already, so skip the sort and its copy when it is
+    if not df["TIMESTAMP"].is_monotonic_increasing:
+        df = df.sort_values("TIMESTAMP")
+    return df.reset_index(drop=True)
+
+
+def file_read_pl(file_path: str) -> pl.DataFrame | None:
+    """
+    Polars equivalent of file_read: same cleaning, same result rows. The raw
+    parse comes from the shared logger cache, so repeat runs skip the CSV.
+    """
+    try:
+        with profiling.stage("read", file_path) as s:
+            lf = s.frame(read_logger(file_path)).lazy()
+        columns = lf.collect_schema().names()
+
+        if "STATION" in columns:
+            lf = lf.drop("STATION")
+            columns.remove("STATION")
+
+        if "TIMESTAMP" not in columns:
+            console.print("Missing TIMESTAMP column.", style="error")
+            return None
+
+        value_cols = [c for c in columns if c != "TIMESTAMP"]
+        dtypes = dict(zip(columns, lf.collect_schema().dtypes()))
+
+        # Integers stay integers (as with pd.to_numeric); anything else is a float
+        plan = agg_plan(
+            tuple(value_cols), tuple(c for c in value_cols if dtypes[c].is_integer())
+        )
+        casts = [
+            pl.col(c).cast(pl.Float64, strict=False).fill_nan(None)
+            for c in plan.float_cols
+        ]
+
+        return profiling.collect(
+            lf.with_columns(
+                pl.col("TIMESTAMP")
+                if dtypes["TIMESTAMP"] == pl.Datetime
+                else pl.col("TIMESTAMP").cast(pl.String).str.to_datetime(strict=False),
+                *casts,
+            )
+            .drop_nulls("TIMESTAMP")
+            .filter(~pl.all_horizontal(pl.col(value_cols).is_null()))
+            .sort("TIMESTAMP"),
+            "clean",
+        )
     except Exception as e:
         console.print(f"#1 Error occurred: {e}", style="error")
         return None
 
 
+def read_frame(file_path: str, backend: str = "pandas") -> Frame | None:
+    return file_read_pl(file_path) if backend == "polars" else file_read(file_path)
+
+
 # ---------- Time utils ----------
 
 
 VALID_MINUTES = [5, 15, 30, 60, 1440]
-ALIAS = {5: "5min", 15: "15min", 30: "30min", 60: "H", 1440: "D"}
+# Fixed minute ticks: pandas' "H" and calendar "D" change between versions
+ALIAS = {5: "5min", 15: "15min", 30: "30min", 60: "60min", 1440: "1440min"}
+# Windows end on the label and line up with the epoch, as in group_by_dynamic
+EDGES = {"closed": "right", "label": "right", "origin": "epoch"}
+PL_ALIAS = {5: "5m", 15: "15m", 30: "30m", 60: "1h", 1440: "1d"}
+BACKENDS = ["pandas", "polars"]
+CHUNK_ROWS = 500_000
+# Output precision, and the digit float noise is rounded off at first
+DECIMALS = 3
+NOISE_DECIMALS = 9
+# Candidates shown in the menu for --find
+FIND_LIMIT = 30
 
 
-def detect_interval_minutes(df: pd.DataFrame) -> int:
+def detect_interval_minutes(df: Frame) -> int:
+    if isinstance(df, pl.DataFrame):
+        return detect_interval_minutes_pl(df)
     # Use mode of first few diffs in minutes
     diffs = df["TIMESTAMP"].diff().dropna()
     if diffs.empty:
@@ -85,8 +186,21 @@ def detect_interval_minutes(df: pd.DataFrame) -> int:
     return interval
 
 
-def time_check(file_path: str) -> int:
-    df = file_read(file_path)
+def detect_interval_minutes_pl(df: pl.DataFrame) -> int:
+    diffs = df["TIMESTAMP"].diff().drop_nulls()
+    if diffs.is_empty():
+        raise ValueError("Cannot infer interval from a single row.")
+    mins = (diffs.dt.total_seconds() / 60).round().cast(pl.Int64)
+    # pandas' mode() breaks ties with the smallest value
+    interval = mins.mode().min()
+    if interval not in VALID_MINUTES:
+        raise ValueError(f"Unsupported interval: {interval} minutes")
+    return interval
+
+
+def time_check(file_path: str, df: Frame | None = None) -> int:
+    if df is None:
+        df = file_read(file_path)
     if df is None:
         sys.exit(1)
     interval = detect_interval_minutes(df)
@@ -104,41 +218,133 @@ def time_check(file_path: str) -> int:
 # ---------- Resampling ----------
 
 
-def build_agg_map(columns: list[str]) -> dict[str, str]:
+# Name rules checked in order; the first match wins and anything unmatched is
+# averaged. Add site-specific suffixes with register_agg_rule instead of
+# editing this list.
+AGG_RULES: list[tuple[re.Pattern, str]] = [
+    # Extremes first, so WD_Max and WindDir_Min are not vector-averaged
+    (re.compile(r"Max$"), "max"),
+    (re.compile(r"Min$"), "min"),
+    # sigma-theta named after its direction (WD_SD1_WVT, WD_Std, WindDir_Std),
+    # ahead of the direction rule these names also match
+    (re.compile(r"^(WD|WindDir)\w*?(_SD|Std)"), "sigma"),
+    # sigma-theta named first (SigmaWD, SDWD, Sigma_Theta); the wind direction
+    # token is required, so Solar_Dir is not one
+    (re.compile(r"^(Sigma|SD|Std)_?(WD|WindDir|Theta)(?![a-z])"), "sigma"),
+    # wind direction (WD, WindDir_D1_WVT)
+    (re.compile(r"^(WD|WindDir)"), "vector"),
+    (re.compile(r"Avg$"), "mean"),
+    (re.compile(r"Tot$"), "sum"),
+    # wind comps without trailing n/x
+    (re.compile(r"^W.*(?<![nx])$"), "mean"),
+    # sigma without trailing n/x/g
+    (re.compile(r"^S.*(?<![nxg])$"), "mean"),
+]
+AGGS = ("mean", "max", "min", "sum", "vector", "sigma")
+CIRCULAR = ("vector", "sigma")
+
+
+@dataclass(frozen=True)
+class AggPlan:
+    columns: tuple[str, ...]  # value columns in output order
+    agg: dict[str, str]  # column -> one of AGGS
+    float_cols: tuple[str, ...]  # coerced to Float64; the rest keep their int dtype
+    # vector column -> speed column weighting it (or None),
+    # sigma column -> direction column its window means come from
+    pairs: dict[str, str | None]
+
+    @property
+    def circular(self) -> bool:
+        return any(how in CIRCULAR for how in self.agg.values())
+
+
+def _speed_for(direction: str, columns: tuple[str, ...]) -> str | None:
+    candidates = [
+        direction.replace("WD", "WS", 1),
+        direction.replace("WindDir", "WindSpd", 1),
+        direction.replace("WindDir", "WS", 1),
+    ]
+    for cand in candidates:
+        if cand != direction and cand in columns:
+            return cand
+    speeds = [c for c in columns if c.startswith(("WS", "WindSpd"))]
+    return speeds[0] if len(speeds) == 1 else None
+
+
+def _direction_for(sigma: str, directions: list[str]) -> str | None:
     """
-    Decide per-column aggregation based on name patterns.
-    Defaults to mean.
+    Direction column a sigma-theta column belongs to, by name (WD_SD1_WVT ->
+    WD_D1_WVT, WindDir_Std -> WindDir, SigmaWD2 -> WD2), or the table's only
+    direction. None when several directions exist and none is named.
+    """
+    candidates = [
+        sigma.replace("_SD", "_D", 1),
+        re.sub(r"_?(SD|Std)\d*$", "", sigma),
+        re.sub(r"^(Sigma|SD|Std)_?", "", sigma),
+    ]
+    for cand in candidates:
+        if cand != sigma and cand in directions:
+            return cand
+    named = [d for d in directions if d in sigma]
+    if named:
+        return max(named, key=len)
+    return directions[0] if len(directions) == 1 else None
+
+
+def register_agg_rule(pattern: str, agg: str) -> None:
+    """Add a name rule ahead of the built-in ones, e.g. ``r"_Std$", "mean"``."""
+    if agg not in AGGS:
+        raise ValueError(f"Unsupported aggregation {agg!r}, expected one of {AGGS}")
+    AGG_RULES.insert(0, (re.compile(pattern), agg))
+    agg_plan.cache_clear()
+
+
+def register_agg_rules(rules: list[str]) -> None:
+    """Register ``PATTERN=AGG`` strings from the command line, last one first."""
+    for rule in rules:
+        pattern, sep, agg = rule.rpartition("=")
+        if not sep:
+            raise ValueError(f"Expected PATTERN=AGG, got {rule!r}")
+        register_agg_rule(pattern, agg)
+
+
+@functools.lru_cache(maxsize=256)
+def agg_plan(columns: tuple[str, ...], int_cols: tuple[str, ...] = ()) -> AggPlan:
+    """
+    Compile the per-column aggregation and cast plan for one column layout.
+    Memoized on the column tuple, so files from the same logger program share
+    one plan.
     """
     agg = {}
     for col in columns:
-        if re.search(r"Avg$", col):
-            agg[col] = "mean"
-        elif re.search(r"Max$", col):
-            agg[col] = "max"
-        elif re.search(r"Min$", col):
-            agg[col] = "min"
-        elif re.search(r"Tot$", col):
-            agg[col] = "sum"
-        # wind comps without trailing n/x
-        elif re.search(r"^W.*(?<![nx])$", col):
-            agg[col] = "mean"
-        elif re.search(r"^S.*(?<![nxg])$", col):  # sigma without trailing n/x/g
-            agg[col] = "mean"
-        else:
-            agg[col] = "mean"
-    return agg
+        agg[col] = next(
+            (how for pattern, how in AGG_RULES if pattern.search(col)), "mean"
+        )
 
+    pairs = {}
+    directions = [c for c in columns if agg[c] == "vector"]
+    for col in directions:
+        pairs[col] = _speed_for(col, columns)
+    for col in columns:
+        if agg[col] == "sigma":
+            pairs[col] = _direction_for(col, directions)
+            if pairs[col] is None:
+                # No direction to compute sigma-theta from
+                agg[col] = "mean"
 
-def time_change(file_path: str) -> tuple[pd.DataFrame, int]:
-    df = file_read(file_path)
-    if df is None:
-        sys.exit(1)
+    float_cols = tuple(c for c in columns if c not in int_cols)
+    return AggPlan(columns, agg, float_cols, pairs)
+
+
+def build_agg_map(columns: list[str]) -> dict[str, str]:
+    """
+    Decide per-column aggregation based on name patterns.
+    Defaults to mean.
+    """
+    return dict(agg_plan(tuple(columns)).agg)
 
-    current = detect_interval_minutes(df)
-    value_cols = [c for c in df.columns if c != "TIMESTAMP"]
-    col_order = df.columns.tolist()
 
-    # Menu
+def choose_target() -> int:
     options = ["5", "15", "30", "60", "1440", "exit"]
     menu = TerminalMenu(options, title="What aggregation would you like to convert to?")
     sel = menu.show()
@@ -149,7 +355,7 @@ def time_change(file_path: str) -> tuple[pd.DataFrame, int]:
         sys.exit(0)
 
     try:
-        target = int(choice)
+        return int(choice)
     except ValueError:
         console.print(
             f"Please specify a valid time as an integer {VALID_MINUTES}",
@@ -157,34 +363,305 @@ def time_change(file_path: str) -> tuple[pd.DataFrame, int]:
         )
         sys.exit(1)
 
+
+def check_target(current: int, target: int) -> None:
     if target not in VALID_MINUTES:
-        console.print(f"Unsupported target interval: {target}", style="error")
-        sys.exit(1)
+        raise ValueError(f"Unsupported target interval: {target}")
     if target < current:
-        console.print(
-            "Cannot convert to a *shorter* interval than the source.", style="error"
-        )
-        sys.exit(1)
+        raise ValueError("Cannot convert to a *shorter* interval than the source.")
 
+
+def resample(df: Frame, current: int, target: int) -> Frame:
+    """
+    Resample a cleaned frame from the `current` interval to `target` minutes.
+    Raises ValueError for unsupported or shorter targets.
+    """
+    if isinstance(df, pl.DataFrame):
+        return resample_pl(df, current, target)
+    check_target(current, target)
+
+    value_cols = [c for c in df.columns if c != "TIMESTAMP"]
+    col_order = df.columns.tolist()
     freq = ALIAS[target]
 
+    # Wind direction and sigma-theta are built from vector sums
+    if agg_plan(tuple(value_cols)).circular:
+        return resample_many(df, current, [target])[target]
+
     # Resample in one pass with a per-column agg map
     g = build_agg_map(value_cols)
 
     df_idx = df.set_index("TIMESTAMP")
-    try:
-        res = df_idx.resample(freq, closed="right", label="right").agg(g)
-    except Exception as e:
-        console.print(f"#2 Error occurred during resample: {e}", style="error")
-        sys.exit(1)
+    res = df_idx.resample(freq, **EDGES).agg(g)
 
     # Reorder to original order if still present
     existing = [c for c in col_order if c in res.columns or c == "TIMESTAMP"]
     res = res.reindex(columns=[c for c in existing if c != "TIMESTAMP"])
-    res = res.round(3)
+    res = round_values(res)
 
     # Restore TIMESTAMP as a column
-    res = res.reset_index()
+    return res.reset_index()
+
+
+def resample_pl(df: pl.DataFrame, current: int, target: int) -> pl.DataFrame:
+    """
+    Polars backend for resample: same right-closed, right-labelled windows,
+    same agg map and rounding as the pandas path. polars and pandas sum in a
+    different order, so unrounded means differ in the last bits; round_values
+    keeps that from reaching the output.
+    """
+    check_target(current, target)
+
+    value_cols = [c for c in df.columns if c != "TIMESTAMP"]
+    every = PL_ALIAS[target]
+    if agg_plan(tuple(value_cols)).circular:
+        return resample_many(df, current, [target])[target]
+    g = build_agg_map(value_cols)
+
+    res = df.group_by_dynamic(
+        "TIMESTAMP", every=every, closed="right", label="right"
+    ).agg(getattr(pl.col(c), how)() for c, how in g.items())
+    res = fill_empty_windows(res, every, [c for c, how in g.items() if how == "sum"])
+
+    return round_values(res.select("TIMESTAMP", *value_cols))
+
+
+def round_values(df: Frame) -> Frame:
+    """
+    Round values to DECIMALS. Means of 3-decimal readings often land exactly
+    on a half (39.1645), and which way such a tie goes would depend on float
+    noise from the order values were summed in, so they are first rounded to
+    NOISE_DECIMALS to drop it.
+    """
+    if isinstance(df, pl.DataFrame):
+        return df.with_columns(pl.col(pl.Float64).round(NOISE_DECIMALS).round(DECIMALS))
+    return df.round(NOISE_DECIMALS).round(DECIMALS)
+
+
+def fill_empty_windows(res: pl.DataFrame, every: str, sum_cols: list[str]) -> pl.DataFrame:
+    """
+    pandas also emits the empty windows between the first and last label,
+    and sums over an empty window are 0.
+    """
+    if not res.height:
+        return res
+    ts = res["TIMESTAMP"]
+    full = pl.datetime_range(
+        ts[0], ts[-1], every, time_unit=ts.dtype.time_unit, eager=True
+    ).alias("TIMESTAMP")
+    return (
+        full.to_frame()
+        .join(res, on="TIMESTAMP", how="left")
+        .with_columns(pl.col(c).fill_null(0) for c in sum_cols)
+    )
+
+
+# ---------- Cascaded resampling ----------
+
+
+def partial_columns(plan: AggPlan) -> dict[str, str]:
+    """
+    Map each carried partial column to the agg that rolls it up into the next
+    coarser product. Means are carried as a running sum and count, wind
+    directions as summed (speed-weighted) vector components and sigma-theta
+    as the summed squares of the logged sigmas plus the summed unit vectors
+    of the mean directions; max, min and sum roll up with themselves.
+    """
+    parts = {}
+    for col, how in plan.agg.items():
+        if how == "mean":
+            parts[f"{col}__sum"] = "sum"
+        elif how == "vector":
+            parts[f"{col}__u"] = "sum"
+            parts[f"{col}__v"] = "sum"
+        elif how == "sigma":
+            parts[f"{col}__sin"] = "sum"
+            parts[f"{col}__cos"] = "sum"
+            parts[f"{col}__var"] = "sum"
+        else:
+            parts[col] = how
+            continue
+        parts[f"{col}__n"] = "sum"
+    return parts
+
+
+def resample_many(df: Frame, current: int, targets: list[int]) -> dict[int, Frame]:
+    """
+    Build every target product from one parsed frame. Each product is rolled
+    up from the previous, finer one instead of from the source rows. Means
+    are carried as sums and counts, so a product has the same values as a
+    single-target resample; only the float noise of the different summing
+    order differs, and round_values drops it.
+    """
+    targets = sorted(set(targets))
+    for target in targets:
+        check_target(current, target)
+
+    value_cols = [c for c in df.columns if c != "TIMESTAMP"]
+    plan = agg_plan(tuple(value_cols))
+    parts = partial_columns(plan)
+
+    if isinstance(df, pl.DataFrame):
+        return _resample_many_pl(df, targets, plan, parts)
+
+    partial = carry_partials(df, plan)
+    products = {}
+    for target in targets:
+        partial = partial.resample(ALIAS[target], **EDGES).agg(parts)
+        products[target] = finish_partials(partial, plan)
+    return products
+
+
+def carry_partials(df: pd.DataFrame, plan: AggPlan) -> pd.DataFrame:
+    """Turn cleaned rows into TIMESTAMP-indexed partial columns."""
+    idx = df.set_index("TIMESTAMP")
+    carried = {}
+    for col, how in plan.agg.items():
+        if how == "mean":
+            carried[f"{col}__sum"] = idx[col]
+            valid = idx[col].notna()
+        elif how in CIRCULAR:
+            direction = idx[col if how == "vector" else plan.pairs[col]]
+            theta = np.radians(direction)
+            weight = 1.0
+            if how == "vector" and plan.pairs[col] is not None:
+                weight = idx[plan.pairs[col]]
+            valid = (theta * weight).notna()
+            if how == "sigma":
+                valid &= idx[col].notna()
+                carried[f"{col}__var"] = (idx[col] ** 2).where(valid)
+            sin = (np.sin(theta) * weight).where(valid)
+            cos = (np.cos(theta) * weight).where(valid)
+            names = ("__u", "__v") if how == "vector" else ("__sin", "__cos")
+            carried[col + names[0]] = sin
+            carried[col + names[1]] = cos
+        else:
+            carried[col] = idx[col]
+            continue
+        carried[f"{col}__n"] = valid.astype(int)
+    return pd.DataFrame(carried, index=idx.index)
+
+
+def finish_partials(partial: pd.DataFrame, plan: AggPlan) -> pd.DataFrame:
+    """Turn resampled partial columns back into the output product."""
+    res = {}
+    for col, how in plan.agg.items():
+        if how not in ("mean", *CIRCULAR):
+            res[col] = partial[col]
+            continue
+        n = partial[f"{col}__n"].where(partial[f"{col}__n"] > 0)
+        if how == "mean":
+            res[col] = partial[f"{col}__sum"] / n
+        elif how == "vector":
+            deg = np.degrees(np.arctan2(partial[f"{col}__u"], partial[f"{col}__v"]))
+            res[col] = (deg % 360).where(n.notna())
+        else:
+            res[col] = pooled_sigma(
+                partial[f"{col}__var"] / n,
+                yamartino(partial[f"{col}__sin"] / n, partial[f"{col}__cos"] / n),
+            )
+    return round_values(pd.DataFrame(res, index=partial.index)).reset_index()
+
+
+def yamartino(mean_sin, mean_cos):
+    """Yamartino (1984) sigma-theta in degrees from mean unit-vector components."""
+    eps = np.sqrt(np.clip(1 - (mean_sin**2 + mean_cos**2), 0, 1))
+    return np.degrees(np.arcsin(eps) * (1 + 0.1547 * eps**3))
+
+
+def pooled_sigma(mean_var, between):
+    """
+    sigma-theta of a window from its sub-intervals: the mean of the logged
+    sigma-theta variances plus the Yamartino spread of their mean directions
+    (law of total variance, exact for a linear quantity and close for
+    directions as spread as sigma-theta usually is).
+    """
+    return (mean_var + between**2) ** 0.5
+
+
+def _resample_many_pl(
+    df: pl.DataFrame, targets: list[int], plan: AggPlan, parts: dict[str, str]
+) -> dict[int, pl.DataFrame]:
+    carried = []
+    for col, how in plan.agg.items():
+        if how == "mean":
+            carried.append(pl.col(col).alias(f"{col}__sum"))
+            valid = pl.col(col).is_not_null()
+        elif how in CIRCULAR:
+            theta = pl.col(col if how == "vector" else plan.pairs[col]).radians()
+            weight = pl.lit(1.0)
+            if how == "vector" and plan.pairs[col] is not None:
+                weight = pl.col(plan.pairs[col])
+            valid = theta.is_not_null() & weight.is_not_null()
+            if how == "sigma":
+                valid = valid & pl.col(col).is_not_null()
+                carried.append(pl.when(valid).then(pl.col(col).pow(2)).alias(f"{col}__var"))
+            names = ("__u", "__v") if how == "vector" else ("__sin", "__cos")
+            carried.append(pl.when(valid).then(theta.sin() * weight).alias(col + names[0]))
+            carried.append(pl.when(valid).then(theta.cos() * weight).alias(col + names[1]))
+        else:
+            carried.append(pl.col(col))
+            continue
+        carried.append(valid.cast(pl.Int64).alias(f"{col}__n"))
+    partial = df.select("TIMESTAMP", *carried)
+    sum_cols = [p for p, how in parts.items() if how == "sum"]
+
+    products = {}
+    for target in targets:
+        every = PL_ALIAS[target]
+        partial = partial.group_by_dynamic(
+            "TIMESTAMP", every=every, closed="right", label="right"
+        ).agg(getattr(pl.col(p), how)() for p, how in parts.items())
+        partial = fill_empty_windows(partial, every, sum_cols)
+
+        out = []
+        for col, how in plan.agg.items():
+            has_rows = pl.col(f"{col}__n") > 0
+            if how == "mean":
+                expr = pl.col(f"{col}__sum") / pl.col(f"{col}__n")
+            elif how == "vector":
+                expr = pl.arctan2(pl.col(f"{col}__u"), pl.col(f"{col}__v")).degrees() % 360
+            elif how == "sigma":
+                mean_sin = pl.col(f"{col}__sin") / pl.col(f"{col}__n")
+                mean_cos = pl.col(f"{col}__cos") / pl.col(f"{col}__n")
+                eps = (1 - (mean_sin.pow(2) + mean_cos.pow(2))).clip(0, 1).sqrt()
+                between = (eps.arcsin() * (1 + 0.1547 * eps.pow(3))).degrees()
+                expr = pooled_sigma(pl.col(f"{col}__var") / pl.col(f"{col}__n"), between)
+            else:
+                out.append(pl.col(col))
+                continue
+            out.append(pl.when(has_rows).then(expr).alias(col))
+        products[target] = round_values(partial.select("TIMESTAMP", *out))
+    return products
+
+
+def time_change(
+    file_path: str,
+    target: int | None = None,
+    df: Frame | None = None,
+    current: int | None = None,
+    backend: str = "pandas",
+) -> tuple[Frame, int]:
+    if df is None:
+        df = read_frame(file_path, backend)
+    if df is None:
+        sys.exit(1)
+
+    if current is None:
+        current = detect_interval_minutes(df)
+
+    if target is None:
+        target = choose_target()
+
+    try:
+        with profiling.stage("resample") as s:
+            res = s.frame(resample(df, current, target))
+    except ValueError as e:
+        console.print(str(e), style="error")
+        sys.exit(1)
+    except Exception as e:
+        console.print(f"#2 Error occurred during resample: {e}", style="error")
+        sys.exit(1)
 
     return res, target
 
@@ -192,32 +669,408 @@ def time_change(file_path: str) -> tuple[pd.DataFrame, int]:
 # ---------- Export ----------
 
 
-def time_file(file_path: str) -> None:
+def output_path_for(file_path: str, minutes: int, directory: str = DOWNLOAD) -> str:
     date = dt.datetime.now()
-    # directory = os.path.dirname(file_path)
-    directory = DOWNLOAD
     basename = os.path.basename(file_path)
+    new_filename = f"{date.strftime('%Y%m%d')}-{minutes}-min_{basename}"
+    return os.path.join(directory, new_filename)
 
-    df_out, minutes = time_change(file_path)
 
-    new_filename = f"{date.strftime('%Y%m%d')}-{minutes}-min_{basename}"
-    output_path = os.path.join(directory, new_filename)
+def write_frame(df: Frame, output_path: str) -> None:
+    with profiling.stage("write", output_path) as s:
+        s.rows = len(df)
+        if isinstance(df, pd.DataFrame):
+            df.to_csv(output_path, index=False)
+            return
+        # pandas' to_csv drops the time of day when every stamp is midnight
+        ts = df["TIMESTAMP"]
+        midnight = ts.len() > 0 and (ts.dt.truncate("1d") == ts).all()
+        df.write_csv(
+            output_path, datetime_format="%Y-%m-%d" if midnight else "%Y-%m-%d %H:%M:%S"
+        )
+
+
+def time_file(
+    file_path: str,
+    target: int | None = None,
+    df: Frame | None = None,
+    current: int | None = None,
+    directory: str = DOWNLOAD,
+    backend: str = "pandas",
+) -> None:
+    df_out, minutes = time_change(
+        file_path, target, df=df, current=current, backend=backend
+    )
 
-    df_out.to_csv(output_path, index=False)
+    output_path = output_path_for(file_path, minutes, directory)
+
+    write_frame(df_out, output_path)
     console.print(
         f"Success. File converted to a {minutes}-min datafile", style="success"
     )
 
 
+# ---------- Chunked / incremental ----------
+
+
+def roll_windows(
+    partial: pd.DataFrame,
+    plan: AggPlan,
+    target: int,
+    last_closed: pd.Timestamp | None = None,
+    carry: dict | None = None,
+    final: bool = False,
+) -> tuple[pd.DataFrame, pd.Series | None, pd.Timestamp | None]:
+    """
+    Resample partial rows that continue on from `last_closed`, merging the
+    still-open window's partial values `carry` back in.
+
+    Returns the closed windows, the window still open (None when `final`) and
+    the new last closed label.
+    """
+    step = pd.Timedelta(minutes=target)
+    if last_closed is not None:
+        # Rows inside already written windows cannot be merged any more
+        partial = partial[partial.index > last_closed]
+    last_seen = partial.index.max() if len(partial) else None
+
+    if last_closed is not None:
+        # Carry the open window, or an empty one so gaps still get their rows
+        carry = carry or {}
+        row = {p: carry.get(p, 0 if p.endswith("__n") else None) for p in partial.columns}
+        carried = pd.DataFrame(
+            [row],
+            index=pd.DatetimeIndex([last_closed + step], name="TIMESTAMP"),
+            dtype=float,
+        )
+        partial = pd.concat([carried, partial])
+
+    windows = partial.resample(ALIAS[target], **EDGES).agg(
+        partial_columns(plan)
+    )
+    if windows.empty:
+        return windows, None, last_closed
+
+    # The last window stays open until a row lands on its right edge
+    if final or (last_seen is not None and last_seen >= windows.index[-1]):
+        return windows, None, windows.index[-1]
+    return windows.iloc[:-1], windows.iloc[-1], windows.index[-1] - step
+
+
+def iter_chunks(file_path: str, chunk_rows: int):
+    """Yield cleaned `file_read` frames of at most `chunk_rows` source rows."""
+    skiprows = toa5.PANDAS_SKIPROWS if toa5.is_toa5(file_path) else None
+    with pd.read_csv(file_path, chunksize=chunk_rows, skiprows=skiprows) as reader:
+        for chunk in reader:
+            df = clean_frame(chunk)
+            if df is None:
+                raise ValueError("Missing TIMESTAMP column.")
+            if len(df):
+                yield df
+
+
+def time_file_chunked(
+    file_path: str, targets: list[int], directory: str, chunk_rows: int = CHUNK_ROWS
+) -> str:
+    """
+    Resample a file block by block, carrying each target's open window across
+    chunk boundaries. Memory is bounded by `chunk_rows`, not by the file.
+    """
+    targets = sorted(set(targets))
+    plan = current = None
+    carries = {t: (None, None) for t in targets}
+    written = dict.fromkeys(targets, 0)
+    rows = 0
+
+    def append(target: int, closed: pd.DataFrame) -> None:
+        if not len(closed):
+            return
+        path = output_path_for(file_path, target, directory)
+        first = not written[target]
+        finish_partials(closed, plan).to_csv(
+            path, mode="w" if first else "a", header=first, index=False
+        )
+        written[target] += len(closed)
+
+    for df in iter_chunks(file_path, chunk_rows):
+        if plan is None:
+            current = detect_interval_minutes(df)
+            for target in targets:
+                check_target(current, target)
+            plan = agg_plan(tuple(c for c in df.columns if c != "TIMESTAMP"))
+        rows += len(df)
+
+        partial = carry_partials(df, plan)
+        for target in targets:
+            last_closed, carry = carries[target]
+            closed, open_row, last_closed = roll_windows(
+                partial, plan, target, last_closed, carry
+            )
+            append(target, closed)
+            carries[target] = (
+                last_closed,
+                None if open_row is None else open_row.to_dict(),
+            )
+
+    if plan is None:
+        raise ValueError("No rows to resample.")
+
+    # End of file: whatever is still open is complete
+    for target in targets:
+        last_closed, carry = carries[target]
+        if carry is not None:
+            empty = pd.DataFrame(
+                columns=list(partial_columns(plan)),
+                index=pd.DatetimeIndex([], name="TIMESTAMP"),
+                dtype=float,
+            )
+            closed, _, _ = roll_windows(empty, plan, target, last_closed, carry, final=True)
+            append(target, closed)
+
+    sizes = ", ".join(f"{t} min: {written[t]}" for t in targets)
+    return f"{current} min, {rows} rows in chunks of {chunk_rows} -> {sizes} rows"
+
+
+def incremental_paths(file_path: str, target: int, directory: str) -> tuple[str, str]:
+    """Stable output name (no date prefix) plus its sidecar state file."""
+    output_path = os.path.join(
+        directory, f"{target}-min_{os.path.basename(file_path)}"
+    )
+    return output_path, output_path + ".state.json"
+
+
+def load_state(state_path: str) -> dict | None:
+    try:
+        with open(state_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_state(state_path: str, state: dict) -> None:
+    tmp = state_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, state_path)
+
+
+def time_file_incremental(file_path: str, target: int, directory: str = DOWNLOAD) -> str:
+    """
+    Append newly closed `target`-minute windows to a stable output file.
+
+    A sidecar state file records the byte offset already consumed, the last
+    closed window and the accumulators of the window still open, so each run
+    only parses rows appended since the previous one.
+    """
+    output_path, state_path = incremental_paths(file_path, target, directory)
+    state = load_state(state_path)
+
+    with open(file_path, "rb") as f:
+        # TOA5 files carry three more header lines around the names
+        prefix = [f.readline()]
+        names = prefix[0]
+        if prefix[0].lstrip(b'"').startswith(b"TOA5"):
+            prefix += [f.readline() for _ in range(toa5.HEADER_ROWS - 1)]
+            names = prefix[1]
+        header = b"".join(prefix)
+        # Start over if the source was replaced, truncated or re-headed
+        if (
+            state is None
+            or state.get("target") != target
+            or state.get("header") != header.decode(errors="replace")
+            or state["offset"] > os.path.getsize(file_path)
+            or not os.path.exists(output_path)
+        ):
+            state = None
+            f.seek(len(header))
+        else:
+            f.seek(state["offset"])
+        offset = f.tell()
+        tail = f.read()
+
+    # Leave a half-written last line for the next run
+    tail = tail[: tail.rfind(b"\n") + 1]
+    if not tail:
+        return "no new rows"
+
+    df = file_read(io.BytesIO(names + tail))
+    if df is None:
+        raise ValueError("could not parse new rows")
+    value_cols = [c for c in df.columns if c != "TIMESTAMP"]
+    plan = agg_plan(tuple(value_cols))
+
+    if state is None:
+        current = detect_interval_minutes(df)
+        check_target(current, target)
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        last_closed, carry = None, None
+    else:
+        current = state["current"]
+        last_closed, carry = pd.Timestamp(state["last_closed"]), state["open"]
+
+    closed, open_row, last_closed = roll_windows(
+        carry_partials(df, plan), plan, target, last_closed, carry
+    )
+    if last_closed is None:
+        return "no new rows"
+
+    res = finish_partials(closed, plan)
+    if len(res):
+        write_header = not os.path.exists(output_path)
+        res.to_csv(output_path, mode="a", header=write_header, index=False)
+
+    save_state(
+        state_path,
+        {
+            "target": target,
+            "current": int(current),
+            "header": header.decode(errors="replace"),
+            "offset": offset + len(tail),
+            "last_closed": last_closed.isoformat(),
+            "open": None
+            if open_row is None
+            else {k: (None if pd.isna(v) else float(v)) for k, v in open_row.items()},
+        },
+    )
+    return f"{len(res)} new {target}-min rows, {len(tail)} bytes read"
+
+
+# ---------- Batch ----------
+
+
+def write_products(
+    file_path: str, df: Frame, current: int, targets: list[int], directory: str
+) -> str:
+    """Resample to every target, write each product and describe what was done."""
+    with profiling.stage("resample", targets=targets):
+        if len(targets) == 1:
+            products = {targets[0]: resample(df, current, targets[0])}
+        else:
+            products = resample_many(df, current, targets)
+
+    for target, res in products.items():
+        write_frame(res, output_path_for(file_path, target, directory))
+    sizes = ", ".join(f"{t} min: {len(res)}" for t, res in products.items())
+    return f"{current} min, {len(df)} rows -> {sizes} rows"
+
+
+def process_file(
+    file_path: str,
+    targets: list[int],
+    directory: str,
+    backend: str = "pandas",
+    incremental: bool = False,
+    chunk_rows: int | None = None,
+) -> tuple[str, str, float]:
+    """Read, resample and write one file. Returns (file, message, seconds)."""
+    start = time.perf_counter()
+    if chunk_rows:
+        try:
+            msg = time_file_chunked(file_path, targets, directory, chunk_rows)
+        except Exception as e:
+            msg = f"error: {e}"
+        return file_path, msg, time.perf_counter() - start
+
+    if incremental:
+        try:
+            msg = "; ".join(
+                time_file_incremental(file_path, t, directory) for t in targets
+            )
+        except Exception as e:
+            msg = f"error: {e}"
+        return file_path, msg, time.perf_counter() - start
+
+    df = read_frame(file_path, backend)
+    if df is None:
+        return file_path, "read failed", time.perf_counter() - start
+    try:
+        current = detect_interval_minutes(df)
+        msg = write_products(file_path, df, current, targets, directory)
+    except Exception as e:
+        return file_path, f"error: {e}", time.perf_counter() - start
+
+    return file_path, msg, time.perf_counter() - start
+
+
+def expand_inputs(paths: list[str]) -> list[str]:
+    """Expand directories and glob patterns into a sorted list of CSV files."""
+    files = set()
+    for p in paths:
+        if os.path.isdir(p):
+            files.update(glob.glob(os.path.join(p, "*.csv")))
+        elif glob.has_magic(p):
+            files.update(glob.glob(p))
+        else:
+            files.add(p)
+    return sorted(files)
+
+
+def report_results(results) -> int:
+    """Print one line per (file_path, msg, elapsed) result; return failures."""
+    failed = 0
+    for file_path, msg, elapsed in results:
+        ok = not msg.startswith(("error", "read failed"))
+        failed += not ok
+        console.print(
+            f"{os.path.basename(file_path)}: {msg} ({elapsed:.2f}s)",
+            style="success" if ok else "error",
+        )
+    return failed
+
+
+def run_batch(
+    files: list[str],
+    targets: list[int],
+    directory: str,
+    workers: int | None = None,
+    backend: str = "pandas",
+    incremental: bool = False,
+    agg_rules: list[str] | None = None,
+    chunk_rows: int | None = None,
+) -> int:
+    start = time.perf_counter()
+    if profiling.ENABLED:
+        # Stages are recorded in this process, so profile one file at a time
+        # (and don't start worker processes that would sit idle)
+        failed = report_results(
+            process_file(f, targets, directory, backend, incremental, chunk_rows)
+            for f in files
+        )
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=register_agg_rules,
+            initargs=(agg_rules or [],),
+        ) as pool:
+            futures = [
+                pool.submit(
+                    process_file, f, targets, directory, backend, incremental, chunk_rows
+                )
+                for f in files
+            ]
+            failed = report_results(future.result() for future in as_completed(futures))
+    wall = time.perf_counter() - start
+    console.print(
+        f"{len(files) - failed}/{len(files)} files in {wall:.2f}s", style="info"
+    )
+    return failed
+
+
 # ---------- CLI ----------
 
 
-if __name__ == "__main__":
+def choose_file(query: str | None = None) -> str:
     cwd = os.getcwd()
     while True:
-        files = glob.glob(os.path.join(cwd, "*.csv"))
+        if query is not None:
+            # Best matches from the file index instead of the current directory
+            files = [f.path for f in fuzzy_search.search(query, FIND_LIMIT, exts=(".csv",))]
+        else:
+            files = glob.glob(os.path.join(cwd, "*.csv"))
         if not files:
-            console.print("No CSV files found in current directory.", style="error")
+            where = f"matching '{query}' in the file index" if query is not None else "in current directory"
+            console.print(f"No CSV files found {where}.", style="error")
             sys.exit(1)
         files_menu = TerminalMenu(files, title="Select a csv file")
         idx = files_menu.show()
@@ -225,9 +1078,159 @@ if __name__ == "__main__":
             sys.exit(1)
         file_path = files[idx]
         if file_path.endswith(".csv"):
-            break
+            return file_path
         console.print("This is not a CSV file. Try again.", style="error")
 
-    # Show detected interval once, then run
-    _ = time_check(file_path)
-    time_file(file_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Resample logger CSV files to a coarser interval."
+    )
+    parser.add_argument(
+        "files",
+        nargs="*",
+        help="CSV files, directories or glob patterns (default: pick one from a menu)",
+    )
+    parser.add_argument(
+        "-t",
+        "--target",
+        type=int,
+        nargs="+",
+        choices=VALID_MINUTES,
+        help="Target interval(s) in minutes; several are built in one pass "
+        "(default: pick from a menu)",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: CPU count)",
+    )
+    parser.add_argument(
+        "-o",
+        "--out-dir",
+        default=DOWNLOAD,
+        help="Directory to write resampled files to",
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        choices=BACKENDS,
+        default="pandas",
+        help="Dataframe library used to read and resample (default: pandas)",
+    )
+    parser.add_argument(
+        "-a",
+        "--agg-rule",
+        action="append",
+        default=[],
+        metavar="PATTERN=AGG",
+        help="Extra column-name rule checked before the built-in ones, "
+        "e.g. '_Std$=mean' (repeatable)",
+    )
+    parser.add_argument(
+        "-i",
+        "--incremental",
+        action="store_true",
+        help="Only read rows appended since the last run and append newly "
+        "closed windows to <target>-min_<file> (state kept in a sidecar file)",
+    )
+    parser.add_argument(
+        "-c",
+        "--chunk-rows",
+        type=int,
+        nargs="?",
+        const=CHUNK_ROWS,
+        help=f"Read and resample in blocks of this many rows to bound memory "
+        f"(default when given without a value: {CHUNK_ROWS})",
+    )
+    parser.add_argument(
+        "-f",
+        "--find",
+        metavar="QUERY",
+        help="Pick the file from the best fuzzy matches in the file index "
+        "instead of the current directory",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Report time, rows, bytes and peak memory per stage and print the "
+        "polars plans (files are then processed one at a time)",
+    )
+    parser.add_argument(
+        "--profile-out",
+        metavar="PATH",
+        help="Also write the profile to PATH (implies --profile); "
+        "*.trace.json is written as a Chrome trace",
+    )
+    args = parser.parse_args()
+
+    if args.profile or args.profile_out:
+        profiling.enable(args.profile_out)
+
+    try:
+        register_agg_rules(args.agg_rule)
+    except (ValueError, re.error) as e:
+        parser.error(str(e))
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    if args.files:
+        if args.target is None:
+            parser.error("--target is required when files are given")
+        files = expand_inputs(args.files)
+        if not files:
+            console.print("No CSV files matched.", style="error")
+            sys.exit(1)
+        failed = run_batch(
+            files,
+            args.target,
+            args.out_dir,
+            args.workers,
+            args.backend,
+            args.incremental,
+            args.agg_rule,
+            args.chunk_rows,
+        )
+        sys.exit(1 if failed else 0)
+
+    file_path = choose_file(args.find)
+    if args.incremental or args.chunk_rows:
+        if args.target is None:
+            parser.error("--target is required with --incremental/--chunk-rows")
+        _, msg, _ = process_file(
+            file_path,
+            args.target,
+            args.out_dir,
+            incremental=args.incremental,
+            chunk_rows=args.chunk_rows,
+        )
+        failed = msg.startswith("error")
+        console.print(msg, style="error" if failed else "success")
+        sys.exit(1 if failed else 0)
+
+    df = read_frame(file_path, args.backend)
+    if df is None:
+        sys.exit(1)
+
+    # Show detected interval once, then run on the same frame
+    current = time_check(file_path, df)
+    if args.target and len(args.target) > 1:
+        try:
+            console.print(
+                write_products(file_path, df, current, args.target, args.out_dir),
+                style="success",
+            )
+        except ValueError as e:
+            console.print(str(e), style="error")
+            sys.exit(1)
+        sys.exit(0)
+
+    time_file(
+        file_path,
+        args.target[0] if args.target else None,
+        df=df,
+        current=current,
+        directory=args.out_dir,
+        backend=args.backend,
+    )
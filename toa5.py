@@ -0,0 +1,168 @@
+"""Campbell Scientific TOA5 reader shared by the scripts.
+
+A TOA5 file starts with four header lines: the environment line (station,
+logger, program, table), column names, units and processing. They are parsed
+once into a TOA5Header, which gives a typed polars schema for the data body,
+so the body can be scanned lazily (and only the needed columns parsed)
+instead of collected as strings and sniffed.
+"""
+
+import csv
+from dataclasses import dataclass
+
+import polars as pl
+
+HEADER_ROWS = 4
+# For pd.read_csv: skip the environment, units and processing lines
+PANDAS_SKIPROWS = [0, 2, 3]
+
+# Campbell writes NAN for missing values
+NULL_VALUES = ["NAN", "nan", "NaN", ""]
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S%.f"
+
+# Body rows checked for text in columns the header would make numeric
+INFER_ROWS = 10000
+
+
+@dataclass(frozen=True)
+class TOA5Header:
+    station: str
+    logger: str
+    serial: str
+    os_version: str
+    program: str
+    program_sig: str
+    table: str
+    columns: tuple[str, ...]
+    units: tuple[str, ...]
+    process: tuple[str, ...]
+
+    def dtype(self, column):
+        """Polars dtype of `column` in the data body."""
+        i = self.columns.index(column)
+        if self.units[i] == "TS" or column == "TIMESTAMP":
+            return pl.Datetime
+        if self.units[i] == "RN" or column == "RECORD":
+            return pl.Int64
+        return pl.Float64
+
+    @property
+    def schema(self):
+        """Schema to scan the body with; timestamps are read as text first."""
+        return {
+            c: pl.String if self.dtype(c) == pl.Datetime else self.dtype(c)
+            for c in self.columns
+        }
+
+    def body_schema(self, file_path, columns=None):
+        """`schema` for `columns` (default: all), with columns whose first
+        INFER_ROWS values are not all numbers (status and flag fields) left as
+        String instead of being read as nulls. Text that first shows up past
+        the sample in a numeric column still reads as null."""
+        columns = list(columns or self.columns)
+        schema = {c: self.schema[c] for c in columns}
+        numeric = [c for c in columns if schema[c] == pl.Float64]
+        if not numeric:
+            return schema
+
+        sample = (
+            pl.scan_csv(
+                file_path,
+                has_header=False,
+                skip_rows=HEADER_ROWS,
+                schema=dict.fromkeys(self.columns, pl.String),
+                null_values=NULL_VALUES,
+                truncate_ragged_lines=True,
+            )
+            .select(numeric)
+            .head(INFER_ROWS)
+            .collect()
+        )
+        for c in numeric:
+            values = sample[c].str.strip_chars()
+            if values.cast(pl.Float64, strict=False).null_count() > values.null_count():
+                schema[c] = pl.String
+        return schema
+
+
+def read_header(file_path):
+    """Parse the four TOA5 header lines, or return None for any other file."""
+    with open(file_path, newline="", errors="replace") as f:
+        rows = []
+        for row in csv.reader(f):
+            rows.append(row)
+            if len(rows) == HEADER_ROWS:
+                break
+
+    if not rows or not rows[0] or rows[0][0].strip() != "TOA5":
+        return None
+    if len(rows) < HEADER_ROWS:
+        raise ValueError(f"{file_path}: truncated TOA5 header")
+
+    env = (rows[0][1:] + [""] * 7)[:7]
+    columns = tuple(c.strip() for c in rows[1])
+    n = len(columns)
+    return TOA5Header(
+        *env,
+        columns=columns,
+        units=tuple((rows[2] + [""] * n)[:n]),
+        process=tuple((rows[3] + [""] * n)[:n]),
+    )
+
+
+def is_toa5(source):
+    """`source` is a path or the file's contents as bytes."""
+    if isinstance(source, bytes):
+        head = source[:8]
+    else:
+        with open(source, "rb") as f:
+            head = f.read(8)
+    return head.lstrip(b'"').startswith(b"TOA5")
+
+
+def scan_toa5(file_path, columns=None, header=None):
+    """Lazily scan a TOA5 body with the typed schema from its header.
+
+    Only `columns` (default: all) are parsed; timestamps come back as
+    Datetime and text columns as String (TOA5Header.body_schema).
+    """
+    header = header or read_header(file_path)
+    if header is None:
+        raise ValueError(f"{file_path} is not a TOA5 file")
+
+    # Columns not selected keep the cheap header types; they are never parsed
+    schema = header.schema | header.body_schema(file_path, columns)
+    lf = pl.scan_csv(
+        file_path,
+        has_header=False,
+        skip_rows=HEADER_ROWS,
+        schema=schema,
+        null_values=NULL_VALUES,
+        ignore_errors=True,
+        truncate_ragged_lines=True,
+    )
+    if columns is not None:
+        lf = lf.select(columns)
+
+    timestamps = [
+        c
+        for c in lf.collect_schema().names()
+        if header.dtype(c) == pl.Datetime
+    ]
+    return lf.with_columns(
+        pl.col(timestamps).str.to_datetime(TIMESTAMP_FORMAT, strict=False)
+    )
+
+
+if __name__ == "__main__":
+    import sys
+
+    for path in sys.argv[1:]:
+        h = read_header(path)
+        if h is None:
+            print(f"{path}: not a TOA5 file")
+            continue
+        print(f"{path}: {h.station} / {h.program} / {h.table}")
+        for col, unit, proc in zip(h.columns, h.units, h.process):
+            print(f"  {col:<24} {unit:<16} {proc}")
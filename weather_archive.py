@@ -0,0 +1,180 @@
+"""Local Parquet archive of Open-Meteo history, fetched only where missing.
+
+Hourly values are stored one file per station, variable and station-local
+year, as {ARCHIVE_DIR}/{station}/{variable}/{year}.parquet with columns
+date (UTC) and value. Each station/variable directory also keeps
+coverage.json, the local date ranges already fetched. A request fetches only
+the uncovered gaps, then everything is read back from disk with the date
+filter pushed into the Parquet scan.
+"""
+
+import datetime as dt
+import json
+import os
+from zoneinfo import ZoneInfo
+
+import polars as pl
+
+import profiling
+from weather_fetch import (
+    ARCHIVE_URL, HOURLY, MAX_WORKERS, fetch_many, long_frame, year_chunks,
+)
+
+HOME = os.getenv("HOME")
+
+ARCHIVE_DIR = os.getenv("WEATHER_ARCHIVE_DIR", f"{HOME}/.cache/pyscripts/weather")
+
+# The archive API trails real time by a few days. Newer days are stored but
+# not marked as covered, so they are fetched again once final.
+LAG_DAYS = 7
+
+
+# ---------- Coverage ----------
+
+
+def partition_dir(station, variable):
+    return os.path.join(ARCHIVE_DIR, station.name.replace(os.sep, "_"), variable)
+
+
+def read_coverage(station, variable):
+    path = os.path.join(partition_dir(station, variable), "coverage.json")
+    try:
+        with open(path) as f:
+            return [tuple(dt.date.fromisoformat(d) for d in r) for r in json.load(f)]
+    except FileNotFoundError:
+        return []
+
+
+def write_coverage(station, variable, ranges):
+    path = os.path.join(partition_dir(station, variable), "coverage.json")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump([[a.isoformat(), b.isoformat()] for a, b in ranges], f)
+    os.replace(tmp, path)
+
+
+def merge_ranges(ranges):
+    """Union of inclusive date ranges, with touching ranges joined."""
+    merged = []
+    for a, b in sorted(ranges):
+        if merged and a <= merged[-1][1] + dt.timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], b))
+        else:
+            merged.append((a, b))
+    return merged
+
+
+def missing_ranges(covered, start, end):
+    """Parts of [start, end] not in the (merged) covered ranges."""
+    gaps = []
+    for a, b in covered:
+        if b < start or a > end:
+            continue
+        if a > start:
+            gaps.append((start, a - dt.timedelta(days=1)))
+        start = b + dt.timedelta(days=1)
+    if start <= end:
+        gaps.append((start, end))
+    return gaps
+
+
+def plan_gaps(stations, start, end, variables):
+    """Year-sized fetch jobs for every gap; variables missing the same chunk
+    are requested together."""
+    start, end = dt.date.fromisoformat(start), dt.date.fromisoformat(end)
+    jobs = []
+    for station in stations:
+        by_chunk = {}
+        for var in variables:
+            for a, b in missing_ranges(read_coverage(station, var), start, end):
+                for chunk in year_chunks(a.isoformat(), b.isoformat()):
+                    by_chunk.setdefault(chunk, []).append(var)
+        jobs += [(station, a, b, v) for (a, b), v in sorted(by_chunk.items())]
+    return jobs
+
+
+# ---------- Storage ----------
+
+
+def store(station, df):
+    """Merge a wide fetched frame into the station's variable/year files."""
+    df = df.with_columns(
+        pl.col("date").dt.convert_time_zone(station.timezone).dt.year().alias("year")
+    )
+    for var in df.columns:
+        if var in ("date", "year"):
+            continue
+        directory = partition_dir(station, var)
+        os.makedirs(directory, exist_ok=True)
+        for (year,), part in df.select("date", var, "year").group_by("year"):
+            path = os.path.join(directory, f"{year}.parquet")
+            new = part.select("date", pl.col(var).alias("value"))
+            if os.path.exists(path):
+                new = pl.concat([pl.read_parquet(path), new])
+            new = new.unique("date", keep="last").sort("date")
+            tmp = f"{path}.{os.getpid()}.tmp"
+            new.write_parquet(tmp, statistics=True)
+            os.replace(tmp, path)
+
+
+def update(stations, start, end, variables=HOURLY, client=None,
+           workers=MAX_WORKERS, url=ARCHIVE_URL):
+    """Fetch whatever part of the request the archive does not cover yet."""
+    with profiling.stage("plan gaps"):
+        jobs = plan_gaps(stations, start, end, variables)
+    if not jobs:
+        return 0
+
+    settled = dt.date.today() - dt.timedelta(days=LAG_DAYS)
+    # Downloads and archive writes overlap, so they are one stage
+    with profiling.stage("fetch and store", jobs=len(jobs)) as s:
+        s.rows = s.bytes = 0
+        for (station, a, b, gap_vars), df in fetch_many(jobs, client, workers, url):
+            s.rows += df.height
+            s.bytes += df.estimated_size()
+            store(station, df)
+            b = min(dt.date.fromisoformat(b), settled)
+            a = dt.date.fromisoformat(a)
+            if a > b:
+                continue
+            for var in gap_vars:
+                write_coverage(station, var, merge_ranges(read_coverage(station, var) + [(a, b)]))
+    return len(jobs)
+
+
+# ---------- Reading ----------
+
+
+def scan(stations, start, end, variables=HOURLY):
+    """Lazy long frame (station, date, variable, value) from the archive only."""
+    start, end = dt.date.fromisoformat(start), dt.date.fromisoformat(end)
+    parts = []
+    for station in sorted(stations, key=lambda s: s.name):
+        tz = ZoneInfo(station.timezone)
+        lo = dt.datetime.combine(start, dt.time(), tz).astimezone(dt.timezone.utc)
+        hi = dt.datetime.combine(end + dt.timedelta(days=1), dt.time(), tz).astimezone(dt.timezone.utc)
+        for var in variables:
+            # Partition pruning: only the years asked for are opened
+            paths = [
+                p
+                for year in range(start.year, end.year + 1)
+                if os.path.exists(p := os.path.join(partition_dir(station, var), f"{year}.parquet"))
+            ]
+            if not paths:
+                continue
+            parts.append(
+                pl.scan_parquet(paths)
+                .filter((pl.col("date") >= lo) & (pl.col("date") < hi))
+                .select(pl.lit(station.name).alias("station"), "date",
+                        pl.lit(var).alias("variable"), "value")
+            )
+    if not parts:
+        return long_frame({}).lazy()
+    return pl.concat(parts)
+
+
+def load(stations, start, end, variables=HOURLY, client=None,
+         workers=MAX_WORKERS, url=ARCHIVE_URL):
+    """Long frame for the request, fetching only the gaps in the archive."""
+    update(stations, start, end, variables, client, workers, url)
+    return profiling.collect(scan(stations, start, end, variables), "load archive")
@@ -0,0 +1,162 @@
+"""Concurrent Open-Meteo history fetcher for many stations.
+
+Each station's date range is split into calendar-year requests that run on a
+bounded thread pool sharing one cached, retrying session. The results are
+stacked into one long frame: station, date (UTC), variable, value.
+
+To run without the network, point OPEN_METEO_URL at a local stub server, or
+set OPEN_METEO_OFFLINE=1 to answer only from responses already recorded in
+the cache.
+"""
+
+import datetime as dt
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+
+import openmeteo_requests
+import polars as pl
+import requests_cache
+from retry_requests import retry
+
+ARCHIVE_URL = os.getenv("OPEN_METEO_URL", "https://archive-api.open-meteo.com/v1/archive")
+CACHE_PATH = os.getenv("OPEN_METEO_CACHE", ".cache")
+OFFLINE = os.getenv("OPEN_METEO_OFFLINE", "0") == "1"
+
+# Open-Meteo rate-limits bursts, so keep the pool small
+MAX_WORKERS = 4
+
+HOURLY = [
+    "temperature_2m", "relative_humidity_2m", "precipitation", "rain",
+    "snowfall", "snow_depth", "wind_speed_10m", "wind_direction_10m",
+]
+
+
+@dataclass(frozen=True)
+class Station:
+    name: str
+    latitude: float
+    longitude: float
+    timezone: str = "America/Los_Angeles"
+
+
+def make_client(cache_path=CACHE_PATH, offline=OFFLINE):
+    """One client over one cached session, safe to share between threads."""
+    session = requests_cache.CachedSession(
+        cache_path, expire_after=-1, only_if_cached=offline
+    )
+    if offline:
+        # A cache miss is a 504; retrying it cannot help
+        return openmeteo_requests.Client(session=session)
+    return openmeteo_requests.Client(
+        session=retry(session, retries=5, backoff_factor=0.2)
+    )
+
+
+def year_chunks(start, end):
+    """Split an inclusive ISO date range at calendar-year boundaries."""
+    start, end = dt.date.fromisoformat(start), dt.date.fromisoformat(end)
+    chunks = []
+    while start <= end:
+        stop = min(dt.date(start.year, 12, 31), end)
+        chunks.append((start.isoformat(), stop.isoformat()))
+        start = stop + dt.timedelta(days=1)
+    return chunks
+
+
+def response_frame(response, variables, block="Hourly"):
+    """One block (Hourly, Daily, ...) of a response as a frame.
+
+    The time axis is computed as an int64 epoch range from Time/TimeEnd/
+    Interval, and the value columns wrap the response's float32 buffers
+    without copying them. `variables` names the columns in request order.
+    """
+    data = getattr(response, block)()
+    if data.VariablesLength() != len(variables):
+        raise ValueError(
+            f"{block} has {data.VariablesLength()} variables, expected {len(variables)}"
+        )
+
+    epoch = pl.int_range(data.Time(), data.TimeEnd(), data.Interval(), eager=True)
+    columns = [pl.from_epoch(epoch, time_unit="s").dt.replace_time_zone("UTC").alias("date")]
+    for i, var in enumerate(variables):
+        columns.append(pl.Series(var, data.Variables(i).ValuesAsNumpy()))
+    return pl.DataFrame(columns)
+
+
+def fetch_chunk(client, station, start, end, variables, url=ARCHIVE_URL):
+    params = {
+        "latitude": station.latitude,
+        "longitude": station.longitude,
+        "start_date": start,
+        "end_date": end,
+        "hourly": list(variables),
+        "timezone": station.timezone,
+    }
+    response = client.weather_api(url, params=params)[0]
+    return response_frame(response, variables)
+
+
+def fetch_many(jobs, client=None, workers=MAX_WORKERS, url=ARCHIVE_URL):
+    """Run (station, start, end, variables) requests on the pool.
+
+    Yields (job, wide frame) pairs as each request completes, so a caller can
+    store every chunk and drop it instead of holding them all. A job that
+    fails is reported and left out.
+    """
+    client = client or make_client()
+
+    def run(job):
+        station, a, b, variables = job
+        try:
+            df = fetch_chunk(client, station, a, b, variables, url)
+        except Exception as e:
+            return f"❌ {station.name} {a}..{b}: {e}", None
+        return f"✅ {station.name} {a}..{b}: {df.height} rows", df
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(run, job): job for job in jobs}
+        for future in as_completed(pending):
+            # Popping the future releases its frame once the caller is done
+            job = pending.pop(future)
+            msg, df = future.result()
+            print(msg)
+            if df is not None:
+                yield job, df
+
+
+def long_frame(station_frames):
+    """Stack {station: [wide frames in date order]} into the long layout."""
+    frames = [
+        pl.concat(dfs)
+        .unpivot(index="date", variable_name="variable")
+        .select(pl.lit(name).alias("station"), "date", "variable", "value")
+        for name, dfs in sorted(station_frames.items())
+        if dfs
+    ]
+    if not frames:
+        return pl.DataFrame(
+            schema={"station": pl.String, "date": pl.Datetime("us", "UTC"),
+                    "variable": pl.String, "value": pl.Float32}
+        )
+    return pl.concat(frames)
+
+
+def fetch_history(stations, start, end, variables=HOURLY, client=None,
+                  workers=MAX_WORKERS, url=ARCHIVE_URL):
+    """Fetch every station over [start, end] into one long frame.
+
+    A chunk that fails is reported and left out; the rest are still returned.
+    """
+    jobs = [
+        (s, a, b, variables) for s in stations for a, b in year_chunks(start, end)
+    ]
+
+    # Chunks stay wide until each station's years are stacked in order, so the
+    # long frame comes out sorted without a sort over every row
+    chunks = {s.name: {} for s in stations}
+    for (station, a, *_), df in fetch_many(jobs, client, workers, url):
+        chunks[station.name][a] = df
+    return long_frame(
+        {name: [years[a] for a in sorted(years)] for name, years in chunks.items()}
+    )
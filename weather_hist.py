@@ -1,64 +1,23 @@
-import openmeteo_requests
-import requests_cache
-import pandas as pd
-from retry_requests import retry
+import profiling
+from weather_archive import load
+from weather_fetch import HOURLY, Station
 
 # https://open-meteo.com/en/docs/historical-weather-api?start_date=2024-01-01&end_date=2024-12-31&latitude=32.4543&longitude=110.2827&timezone=America%2FLos_Angeles&hourly=temperature_2m,relative_humidity_2m,precipitation,rain,snowfall,snow_depth,wind_speed_10m,wind_direction_10m
 
+# One line per location; ranges longer than a year are fetched a year at a time
+STATIONS = [
+    Station("Mammoth", 32.722222, -110.644167, "America/Los_Angeles"),
+]
+START_DATE = "2024-01-01"
+END_DATE = "2024-12-31"
 
-# Setup the Open-Meteo API client with cache and retry on error
-cache_session = requests_cache.CachedSession('.cache', expire_after=-1)
-retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-openmeteo = openmeteo_requests.Client(session=retry_session)
+# Any hourly variables; the order does not matter
+VARIABLES = HOURLY
 
-# Make sure all required weather variables are listed here
-# The order of variables in hourly or daily is important to assign them correctly below
-url = "https://archive-api.open-meteo.com/v1/archive"
-params = {
-    "latitude": 32.722222,
-    "longitude": -110.644167,
-    "start_date": "2024-01-01",
-    "end_date": "2024-12-31",
-    "hourly": ["temperature_2m", "relative_humidity_2m", "precipitation", "rain", "snowfall", "snow_depth", "wind_speed_10m", "wind_direction_10m"],
-    "timezone": "America/Los_Angeles"
-}
-responses = openmeteo.weather_api(url, params=params)
-
-# Process first location. Add a for-loop for multiple locations or weather models
-response = responses[0]
-print(f"Coordinates {response.Latitude()}°N {response.Longitude()}°E")
-print(f"Elevation {response.Elevation()} m asl")
-print(f"Timezone {response.Timezone()}{response.TimezoneAbbreviation()}")
-print(f"Timezone difference to GMT+0 {response.UtcOffsetSeconds()} s")
-
-# Process hourly data. The order of variables needs to be the same as requested.
-hourly = response.Hourly()
-hourly_temperature_2m = hourly.Variables(0).ValuesAsNumpy()
-hourly_relative_humidity_2m = hourly.Variables(1).ValuesAsNumpy()
-hourly_precipitation = hourly.Variables(2).ValuesAsNumpy()
-hourly_rain = hourly.Variables(3).ValuesAsNumpy()
-hourly_snowfall = hourly.Variables(4).ValuesAsNumpy()
-hourly_snow_depth = hourly.Variables(5).ValuesAsNumpy()
-hourly_wind_speed_10m = hourly.Variables(6).ValuesAsNumpy()
-hourly_wind_direction_10m = hourly.Variables(7).ValuesAsNumpy()
-
-hourly_data = {"date": pd.date_range(
-    start=pd.to_datetime(hourly.Time(), unit="s", utc=True),
-    end=pd.to_datetime(hourly.TimeEnd(), unit="s", utc=True),
-    freq=pd.Timedelta(seconds=hourly.Interval()),
-    inclusive="left"
-)}
-
-hourly_data["temperature_2m"] = hourly_temperature_2m
-hourly_data["relative_humidity_2m"] = hourly_relative_humidity_2m
-hourly_data["precipitation"] = hourly_precipitation
-hourly_data["rain"] = hourly_rain
-hourly_data["snowfall"] = hourly_snowfall
-hourly_data["snow_depth"] = hourly_snow_depth
-hourly_data["wind_speed_10m"] = hourly_wind_speed_10m
-hourly_data["wind_direction_10m"] = hourly_wind_direction_10m
-
-hourly_dataframe = pd.DataFrame(data=hourly_data)
+# Long format: station, date (UTC), variable, value. Served from the local
+# archive; only ranges it does not hold yet are downloaded.
+hourly_dataframe = load(STATIONS, START_DATE, END_DATE, VARIABLES)
 
 print(hourly_dataframe)
-hourly_dataframe.to_csv('hisorical_weather.csv')
+with profiling.stage("write csv", 'hisorical_weather.csv'):
+    hourly_dataframe.write_csv('hisorical_weather.csv')
@@ -0,0 +1,96 @@
+import sys
+import matplotlib
+# Rendering to a file (python script.py out.png) needs no display
+if len(sys.argv) > 1:
+    matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+
+import profiling
+from climatology import Stat, daily_normals
+from weather_fetch import Station
+
+# -------------- CONFIGURATION --------------
+location = 'Mammoth'
+FIRST_YEAR = 1991
+LAST_YEAR = 2020
+# -------------------------------------------
+
+# Day-of-year normals of daily highs and lows in °F; the years are streamed
+# from the local archive one at a time
+station = Station(location, 32.722222, -110.644167, "America/Los_Angeles")
+spec = [
+    Stat("temperature_2m", daily="max", name="high"),
+    Stat("temperature_2m", daily="min", name="low"),
+]
+normals = daily_normals(station, FIRST_YEAR, LAST_YEAR, spec)
+highs = normals.filter(series="high")
+lows = normals.filter(series="low")
+
+# Plot
+fig, ax = plt.subplots(figsize=(10, 5))
+
+days = highs["date"].to_numpy()
+ax.xaxis.set_major_formatter(mdates.DateFormatter('%b'))
+ax.xaxis.set_major_locator(mdates.MonthLocator())
+
+# Normal highs with the p10–p90 band and record highs
+ax.plot(days, highs["p50"], color='darkred', label='Median High')
+ax.fill_between(days, highs["p10"], highs["p90"], color='red', alpha=0.2,
+                label='High p10–p90')
+ax.plot(days, highs["record_high"], color='darkred', linestyle=':',
+        linewidth=1, label='Record High')
+
+# Normal lows with the p10–p90 band and record lows
+ax.plot(days, lows["p50"], color='navy', label='Median Low')
+ax.fill_between(days, lows["p10"], lows["p90"], color='blue', alpha=0.2,
+                label='Low p10–p90')
+ax.plot(days, lows["record_low"], color='navy', linestyle=':',
+        linewidth=1, label='Record Low')
+
+# Annotate the all-time extremes
+hi = highs["record_high"].arg_max()
+max_day = highs["date"][hi]
+max_temp = highs["record_high"][hi]
+ax.text(max_day, max_temp + 2,
+        f"{max_day.strftime('%b %d')} {highs['record_high_year'][hi]}\n{int(max_temp)}°F",
+        ha="center", fontsize=12)
+
+lo = lows["record_low"].arg_min()
+min_day = lows["date"][lo]
+min_temp = lows["record_low"][lo]
+ax.text(min_day, min_temp - 12,
+        f"{min_day.strftime('%b %d')} {lows['record_low_year'][lo]}\n{int(min_temp)}°F",
+        ha="center", fontsize=12)
+
+# Seasonal shading
+month_num = highs["date"].dt.month().to_numpy()
+hot = (month_num >= 6) & (month_num <= 9)
+cool1 = (month_num <= 2)
+cool2 = (month_num == 12)
+
+ax.axvspan(days[cool1][0], days[cool1][-1], color='blue', alpha=0.1)
+ax.axvspan(days[hot][0], days[hot][-1], color='red', alpha=0.1)
+ax.axvspan(days[cool2][0], days[cool2][-1], color='blue', alpha=0.1)
+
+# Labels and limits
+ax.set_title(
+    f"{location} Daily Temperature Normals {FIRST_YEAR}–{LAST_YEAR}", fontsize=20)
+ax.set_xlabel("Month", fontsize=20)
+ax.set_ylabel("Temperature (°F)", fontsize=20)
+ax.set_ylim(-10, 135)
+ax.set_xlim(days[0], days[-1])
+
+# Tick label size
+ax.tick_params(axis='x', labelsize=14)
+ax.tick_params(axis='y', labelsize=14)
+
+ax.grid(True, linestyle='--', alpha=0.5)
+ax.legend(fontsize=9, ncol=2, loc="lower center")
+
+plt.tight_layout()
+if len(sys.argv) > 1:
+    with profiling.stage("render", sys.argv[1]):
+        fig.savefig(sys.argv[1])
+else:
+    plt.show()
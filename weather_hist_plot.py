@@ -1,12 +1,19 @@
-import openmeteo_requests
-import requests_cache
-import pandas as pd
-from retry_requests import retry
+import sys
+import matplotlib
+# Rendering to a file (python script.py out.png) needs no display
+if len(sys.argv) > 1:
+    matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 
+import profiling
+from climatology import Stat, monthly_stats
+from weather_archive import load
+from weather_fetch import Station
+
 # -------------- CONFIGURATION --------------
 LOCATION = {
+    "name": "Mammoth",
     "latitude": 32.722222,
     "longitude": -110.644167,
     "timezone": "America/Los_Angeles"
@@ -20,73 +27,24 @@ VARIABLE = "temperature_2m"
 AGG_METHOD = "mean"          # "mean", "max", "min", or "sum"
 # -------------------------------------------
 
-# Units mapping (can be expanded as needed)
-UNITS = {
-    "temperature_2m": "°F",
-    "relative_humidity_2m": "%",
-    "precipitation": "mm",
-    "rain": "mm",
-    "snowfall": "mm",
-    "snow_depth": "cm",
-    "wind_speed_10m": "m/s",
-    "wind_direction_10m": "°"
-}
-
-# Optional Fahrenheit conversion for temperature
-CONVERT_TO_FAHRENHEIT = VARIABLE == "temperature_2m"
-
-# Setup Open-Meteo API
-cache_session = requests_cache.CachedSession('.cache', expire_after=-1)
-retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-openmeteo = openmeteo_requests.Client(session=retry_session)
-
-# API Request
-url = "https://archive-api.open-meteo.com/v1/archive"
-params = {
-    "latitude": LOCATION["latitude"],
-    "longitude": LOCATION["longitude"],
-    "start_date": DATE_RANGE["start"],
-    "end_date": DATE_RANGE["end"],
-    "hourly": [VARIABLE],
-    "timezone": LOCATION["timezone"]
-}
-response = openmeteo.weather_api(url, params=params)[0]
-
-# Extract data
-hourly = response.Hourly()
-values = hourly.Variables(0).ValuesAsNumpy()
-timestamps = pd.date_range(
-    start=pd.to_datetime(hourly.Time(), unit="s",
-                         utc=True).tz_convert(LOCATION["timezone"]),
-    end=pd.to_datetime(hourly.TimeEnd(), unit="s",
-                       utc=True).tz_convert(LOCATION["timezone"]),
-    freq=pd.Timedelta(seconds=hourly.Interval()),
-    inclusive="left"
-)
-
-# Build DataFrame
-df = pd.DataFrame({VARIABLE: values}, index=timestamps)
-
-# Optional: convert temperature to Fahrenheit
-if CONVERT_TO_FAHRENHEIT:
-    df[VARIABLE] = (df[VARIABLE] * 9/5) + 32
-
-if VARIABLE in {"precipitation", "rain", "snowfall"}:
-    df[VARIABLE] = df[VARIABLE] / 25.4  # mm → inches
-    UNITS[VARIABLE] = "in"
+# Hourly history from the local archive; only missing ranges are downloaded
+station = Station(LOCATION["name"], LOCATION["latitude"],
+                  LOCATION["longitude"], LOCATION["timezone"])
+hist = load([station], DATE_RANGE["start"], DATE_RANGE["end"], [VARIABLE])
 
-# Daily and monthly aggregation
-daily = df.resample("D").agg(AGG_METHOD)
-monthly = daily.resample("M").agg(AGG_METHOD)
+# Daily then monthly aggregation, with °F / inch conversions, from the
+# shared climatology engine
+stat = Stat(VARIABLE, daily=AGG_METHOD, monthly=AGG_METHOD)
+monthly = monthly_stats(hist, [stat], [station])
 
 # Get unit label
-unit = UNITS.get(VARIABLE, "")  # default to empty if unknown
+unit = monthly["unit"][0]
 
 # Plotting
 fig, ax = plt.subplots(figsize=(10, 5))
-months = monthly.index
+months = monthly["month"].to_numpy()
 
-ax.plot(months, monthly[VARIABLE], marker="o",
+ax.plot(months, monthly["value"], marker="o",
         label=VARIABLE.replace("_", " ").title())
 ax.set_title(f"Monthly {AGG_METHOD.title()} of {
              VARIABLE.replace('_', ' ').title()} - 2024")
@@ -97,4 +55,8 @@ ax.xaxis.set_major_locator(mdates.MonthLocator())
 ax.grid(True, linestyle="--", alpha=0.5)
 ax.legend()
 plt.tight_layout()
-plt.show()
+if len(sys.argv) > 1:
+    with profiling.stage("render", sys.argv[1]):
+        fig.savefig(sys.argv[1])
+else:
+    plt.show()
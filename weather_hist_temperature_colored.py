@@ -1,96 +1,72 @@
-import openmeteo_requests
-import requests_cache
-import pandas as pd
-from retry_requests import retry
+import sys
+import matplotlib
+# Rendering to a file (python script.py out.png) needs no display
+if len(sys.argv) > 1:
+    matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import numpy as np
 
-# Setup Open-Meteo client
-cache_session = requests_cache.CachedSession('.cache', expire_after=-1)
-retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-openmeteo = openmeteo_requests.Client(session=retry_session)
+import profiling
+from climatology import Stat, monthly_stats
+from weather_archive import load
+from weather_fetch import Station
 
 location = 'Mammoth'
 
-# Weather API request
-url = "https://archive-api.open-meteo.com/v1/archive"
-params = {
-    "latitude": 32.722222,
-    "longitude": -110.644167,
-    "start_date": "2024-01-01",
-    "end_date": "2024-12-31",
-    "hourly": ["temperature_2m"],
-    "timezone": "America/Los_Angeles"
-}
-response = openmeteo.weather_api(url, params=params)[0]
-
-# Extract hourly data
-hourly = response.Hourly()
-temps = hourly.Variables(0).ValuesAsNumpy()
-
-dates = pd.date_range(
-    start=pd.to_datetime(hourly.Time(), unit="s",
-                         utc=True).tz_convert("America/Los_Angeles"),
-    end=pd.to_datetime(hourly.TimeEnd(), unit="s",
-                       utc=True).tz_convert("America/Los_Angeles"),
-    freq=pd.Timedelta(seconds=hourly.Interval()),
-    inclusive="left"
-)
-
-# Create DataFrame
-df = pd.DataFrame({"temperature_2m": temps}, index=dates)
-
-# Resample to daily highs and lows
-daily_highs = df.resample("D").max()
-daily_lows = df.resample("D").min()
-
-daily_highs["temperature_2m"] = (daily_highs["temperature_2m"] * 9/5) + 32
-daily_lows["temperature_2m"] = (daily_lows["temperature_2m"] * 9/5) + 32
-
-monthly_highs = daily_highs.resample("M").mean()
-monthly_lows = daily_lows.resample("M").mean()
-
-# Confidence interval using daily std dev (also convert to Fahrenheit)
-high_std = daily_highs.resample("M").std()
-low_std = daily_lows.resample("M").std()
+# Hourly history from the local archive; only missing ranges are downloaded
+station = Station(location, 32.722222, -110.644167, "America/Los_Angeles")
+hist = load([station], "2024-01-01", "2024-12-31", ["temperature_2m"])
+
+# Monthly mean of daily highs and lows in °F, each with a ±1 std band of the
+# daily values, in one pass of the shared climatology engine
+spec = [
+    Stat("temperature_2m", daily="max", monthly="mean", band=True, name="high"),
+    Stat("temperature_2m", daily="min", monthly="mean", band=True, name="low"),
+]
+stats = monthly_stats(hist, spec, [station])
+monthly_highs = stats.filter(series="high")
+monthly_lows = stats.filter(series="low")
 
 # Plot
 fig, ax = plt.subplots(figsize=(10, 5))
 
-months = monthly_highs.index
+months = monthly_highs["month"].to_numpy()
 ax.xaxis.set_major_formatter(mdates.DateFormatter('%b'))
 ax.xaxis.set_major_locator(mdates.MonthLocator())
 
 # Plot high temps
-ax.plot(months, monthly_highs, color='darkred', label='Avg High')
+ax.plot(months, monthly_highs["value"], color='darkred', label='Avg High')
 ax.fill_between(months,
-                monthly_highs["temperature_2m"] - high_std["temperature_2m"],
-                monthly_highs["temperature_2m"] + high_std["temperature_2m"],
+                monthly_highs["value"] - monthly_highs["std"],
+                monthly_highs["value"] + monthly_highs["std"],
                 color='red', alpha=0.2)
 
 # Plot low temps
-ax.plot(months, monthly_lows, color='navy', label='Avg Low')
+ax.plot(months, monthly_lows["value"], color='navy', label='Avg Low')
 ax.fill_between(months,
-                monthly_lows["temperature_2m"] - low_std["temperature_2m"],
-                monthly_lows["temperature_2m"] + low_std["temperature_2m"],
+                monthly_lows["value"] - monthly_lows["std"],
+                monthly_lows["value"] + monthly_lows["std"],
                 color='blue', alpha=0.2)
 
 # Annotate extremes
-max_day = monthly_highs["temperature_2m"].idxmax()
-max_temp = monthly_highs["temperature_2m"].max()
+hi = monthly_highs["value"].arg_max()
+max_day = monthly_highs["month"][hi]
+max_temp = monthly_highs["value"][hi]
 ax.text(max_day, max_temp + 2,
         f"{max_day.strftime('%b %d')}\n{int(max_temp)}°F", ha="center", fontsize=16)
 
-min_day = monthly_lows["temperature_2m"].idxmin()
-min_temp = monthly_lows["temperature_2m"].min()
+lo = monthly_lows["value"].arg_min()
+min_day = monthly_lows["month"][lo]
+min_temp = monthly_lows["value"][lo]
 ax.text(min_day, min_temp - 5,
         f"{min_day.strftime('%b %d')}\n{int(min_temp)}°F", ha="center", fontsize=16)
 
 # Seasonal shading
-hot = (months.month >= 6) & (months.month <= 9)
-cool1 = (months.month <= 2)
-cool2 = (months.month == 12)
+month_num = monthly_highs["month"].dt.month().to_numpy()
+hot = (month_num >= 6) & (month_num <= 9)
+cool1 = (month_num <= 2)
+cool2 = (month_num == 12)
 
 ax.axvspan(months[cool1][0], months[cool1][-1], color='blue', alpha=0.1)
 ax.axvspan(months[hot][0], months[hot][-1], color='red', alpha=0.1)
@@ -112,4 +88,8 @@ ax.grid(True, linestyle='--', alpha=0.5)
 ax.legend(fontsize=14)
 
 plt.tight_layout()
-plt.show()
+if len(sys.argv) > 1:
+    with profiling.stage("render", sys.argv[1]):
+        fig.savefig(sys.argv[1])
+else:
+    plt.show()